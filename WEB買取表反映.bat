@@ -76,7 +76,14 @@ REM [1/6] CardRush取得
 REM ============================================================
 echo.
 echo [1/6] CardRush取得
-"%PY%" "%REPO_ROOT%\cardrush_to_excel.py" --file-path "%EXCEL_PATH%"
+REM --pending-state: 差分取得の状態は .cardrush_state.json.new に置くだけ。[STATE] で push まで成功したときに確定する
+REM   → 価格更新/WEBビルド/commit/push のどこかで失敗したら状態は前回のまま。次回は「変更あり」で全工程をやり直す
+"%PY%" "%REPO_ROOT%\cardrush_to_excel.py" --file-path "%EXCEL_PATH%" --incremental --pending-state
+REM 終了コード3 = CardRush側に変更なし（Excel未更新）→ 価格更新/WEBビルド/commit は不要（Myca CSV は毎回出す）
+if errorlevel 3 (
+  echo [INFO] CardRush 変更なし（価格更新/WEBビルド/commitはスキップ）
+  goto :EXPORT_CSV
+)
 if errorlevel 1 (
   echo [ERR] cardrush_to_excel.py 失敗
   goto :END
@@ -109,8 +116,6 @@ echo [4/6] 変更検出
 
 mkdir "%OUT_DIR%" 2>nul
 
-> "%OUT_DIR%\.buildstamp" echo %TODAY% %NOW%
-
 REM 不要フォルダを削除（GitHub Pagesの容量肥大化防止）
 REM 過去に誤生成された重複ディレクトリ
 rmdir /s /q "%OUT_DIR%\climax" 2>nul
@@ -133,7 +138,7 @@ REM 変更があるかチェック
 "%GIT%" diff --cached --quiet
 if not errorlevel 1 (
   echo [INFO] 変更なし（commit/pushはスキップ）
-  goto :EXPORT_CSV
+  goto :COMMIT_STATE
 )
 
 REM ============================================================
@@ -141,6 +146,9 @@ REM [5/6] commit
 REM ============================================================
 echo.
 echo [5/6] commit
+REM buildstamp は中身が変わったときだけ更新（毎回書くと差分が出続けて毎回commitになる）
+> "%OUT_DIR%\.buildstamp" echo %TODAY% %NOW%
+"%GIT%" add "%OUT_DIR%\.buildstamp"
 set "MSG=build: buylist pages (%TODAY_SAFE% %NOW_SAFE%)"
 "%GIT%" commit -m "%MSG%"
 if errorlevel 1 goto :FAIL_COMMIT
@@ -167,6 +175,17 @@ if errorlevel 1 (
   if errorlevel 1 goto :FAIL_PUSH
 )
 
+REM ============================================================
+REM [STATE] CardRush 差分取得の状態を確定（ここまで全部成功したときだけ）
+REM ============================================================
+:COMMIT_STATE
+echo.
+echo [STATE] 差分取得の状態を確定
+"%PY%" "%REPO_ROOT%\cardrush_to_excel.py" --file-path "%EXCEL_PATH%" --commit-state
+if errorlevel 1 (
+  echo [WARN] 状態の確定に失敗（次回は全工程をやり直します）
+)
+
 REM ============================================================
 REM [CSV] Mycaアップロード用CSV 出力（Python）
 REM ============================================================
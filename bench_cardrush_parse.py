@@ -0,0 +1,107 @@
+﻿# -*- coding: utf-8 -*-
+r"""
+cardrush_to_excel の __NEXT_DATA__ 抽出マイクロベンチ
+
+- 対象: --dir 配下の *.html（既定: buylist_pages_offline/）
+- before: parse_items_from_next_data_soup（BeautifulSoupで全体をパース）
+- after : parse_items_from_next_data（文字列走査 + 学習済みJSONパス）
+- __NEXT_DATA__ を含まないページには CardRush 形式の合成ペイロード（--items 件）を埋め込んで計測
+- 両者の抽出結果が一致しないページがあれば終了コード1
+
+使い方:
+  python bench_cardrush_parse.py
+  python bench_cardrush_parse.py --dir replay_dir --repeat 20
+"""
+
+import argparse
+import json
+import random
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import cardrush_to_excel as cr
+
+
+def _synthetic_next_data(page_no: int, n_items: int) -> str:
+    rnd = random.Random(page_no)
+    items: List[Dict[str, Any]] = []
+    for i in range(n_items):
+        items.append({
+            "id": page_no * 1000 + i,
+            "name": f"カード{page_no}-{i}" + ("(虹)" if rnd.random() < 0.05 else ""),
+            "model_number": f"DM{rnd.randint(22, 26)}RP{rnd.randint(1, 4)} {rnd.randint(1, 99)}/{rnd.randint(100, 120)}",
+            "amount": rnd.choice([10, 30, 50, 100, 500, 1200, 15000, 128000]),
+            "rarity": rnd.choice(["C", "U", "R", "VR", "SR", "MR"]),
+            "display_category": rnd.choice(["通常", "高額系"]),
+            "image_source": f"https://example.invalid/img/{page_no}_{i}.jpg",
+            "is_hot": rnd.random() < 0.1,
+        })
+    data = {
+        "props": {
+            "pageProps": {
+                "meta": {"page": page_no, "limit": n_items},
+                "buyingPrices": items,
+                "categories": [{"id": k, "label": f"cat{k}"} for k in range(20)],
+            }
+        },
+        "page": "/duel_masters/buying_prices",
+        "buildId": "bench",
+    }
+    return ('<script id="__NEXT_DATA__" type="application/json">'
+            + json.dumps(data, ensure_ascii=False) + "</script>")
+
+
+def load_pages(src: Path, n_items: int) -> List[str]:
+    pages: List[str] = []
+    files = sorted(src.glob("*.html"), key=lambda p: (len(p.stem), p.stem))
+    for idx, p in enumerate(files, start=1):
+        html = p.read_text(encoding="utf-8", errors="replace")
+        if "__NEXT_DATA__" not in html:
+            tail = html.rfind("</body>")
+            tail = tail if tail != -1 else len(html)
+            html = html[:tail] + _synthetic_next_data(idx, n_items) + html[tail:]
+        pages.append(html)
+    return pages
+
+
+def _time_per_page(fn, pages: List[str], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for html in pages:
+            fn(html)
+        best = min(best, time.perf_counter() - t0)
+    return best / max(1, len(pages)) * 1000.0
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="__NEXT_DATA__ 抽出のマイクロベンチ（before/after）")
+    ap.add_argument("--dir", default=str(Path(__file__).resolve().parent / "buylist_pages_offline"))
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--items", type=int, default=cr.DEFAULT_LIMIT, help="合成ペイロードの件数/ページ")
+    args = ap.parse_args()
+
+    pages = load_pages(Path(args.dir), args.items)
+    if not pages:
+        print(f"[err] no *.html in {args.dir}")
+        return 1
+
+    mismatched = 0
+    for html in pages:
+        if cr.parse_items_from_next_data_soup(html) != cr.parse_items_from_next_data(html):
+            mismatched += 1
+
+    before = _time_per_page(cr.parse_items_from_next_data_soup, pages, args.repeat)
+    after = _time_per_page(cr.parse_items_from_next_data, pages, args.repeat)
+
+    print(f"[bench] pages={len(pages)} repeat={args.repeat} dir={args.dir}")
+    print(f"   before (BeautifulSoup + DFS): {before:8.3f} ms/page")
+    print(f"   after  (scan + cached path) : {after:8.3f} ms/page")
+    print(f"   speed-up: x{before / after:.1f}" if after > 0 else "   speed-up: n/a")
+    print(f"   mismatched pages: {mismatched}")
+    return 1 if mismatched else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,357 @@
+﻿# -*- coding: utf-8 -*-
+r"""
+値段更新.py のマッチングエンジンのベンチ + ゴールデン（結果固定）チェック
+
+- 入力は match_fixture.json.gz（buylist.xlsm から切り出したシート1の C/E/F列・シート2の A〜C列）。
+  buylist.xlsm は定期実行で書き換わるので、比較は常にこの固定入力で行う
+- real : 固定入力のシート1全行のマッチ結果（シート2行番号・スコア・段）を
+         match_golden.json の固定結果と1行ずつ比較
+- rules: 実データに出てくる E列/F列/シート2型番/商品名の全種類に対して、キー作成ルール
+         （apply_dm_rule_on_e_for_key / trim_after_second_slash_with_y_exception / secret_rank /
+          has_rainbow_mark_raw / model_strict / model_loose / norm_name など）の出力をダイジェストで比較
+- synth: 実データを元にした合成データ（シート1・シート2とも 1k / 10k / 100k 行）のマッチ結果をダイジェストで比較
+    * 実行を重ねるごとに名前に「・2式」「・3式」…を付けた世代を作る（型番は実データのまま）
+      → 行数が増えるほど同じ型番の候補が増え、名前の類似度判定に回る行が増える
+- price: PriceRules（apply / evaluate）を旧 calc_new_price_from_s2 の式と比較
+         （実データのシート2金額 + 境界値・負の金額・小数）
+- 各ステージ（read / s2_index / match / price）の rows/s を表示
+- 1件でも結果が変わっていれば終了コード1、入力自体がゴールデン固定時と違えば終了コード2
+
+使い方:
+  python bench_match_engine.py                    # 比較 + ベンチ
+  python bench_match_engine.py --sizes 1000,10000 # 100k を省く
+  python bench_match_engine.py --freeze           # 現在の結果で match_golden.json を作り直す（ルールを意図して変えたとき）
+  python bench_match_engine.py --xlsm buylist.xlsm                       # 固定入力の代わりにブックを直接読む（読み込み時間も計測）
+  python bench_match_engine.py --fixture-from buylist.xlsm --freeze      # 固定入力をブックから取り直す（ゴールデンも取り直す）
+"""
+
+import argparse
+import gzip
+import hashlib
+import importlib
+import json
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from openpyxl import load_workbook
+
+import price_rules
+
+upd = importlib.import_module("値段更新")
+
+GOLDEN_PATH = str(Path(__file__).resolve().parent / "match_golden.json")
+FIXTURE_PATH = str(Path(__file__).resolve().parent / "match_fixture.json.gz")
+DEFAULT_SIZES = (1000, 10000, 100000)
+
+S2Tuple = Tuple[int, Any, Any, Any]  # (行番号, 商品名, 型番, 金額) = iter_s2_rows と同じ形
+
+
+def _digest(values: Sequence[Any]) -> str:
+    h = hashlib.sha256()
+    for v in values:
+        h.update(json.dumps(v, ensure_ascii=False, default=str).encode("utf-8"))
+        h.update(b"\n")
+    return h.hexdigest()
+
+
+def _result_rows(results: Sequence[Tuple[Optional[int], float, str]]) -> List[list]:
+    return [[r2, round(sc, 6), p] for r2, sc, p in results]
+
+
+# ===== 入力 =====
+def load_real(xlsm: str, timer) -> Tuple[List[upd.S1Job], List[int], List[S2Tuple]]:
+    wb = load_workbook(xlsm, read_only=True, data_only=False)
+    try:
+        with timer.stage("read") as st:
+            cols = upd.read_s1_columns(wb[upd.SHEET1])
+            s2 = list(upd.iter_s2_rows(wb[upd.SHEET2]))
+            st["rows"] = len(cols.rows) + len(s2)
+    finally:
+        wb.close()
+    jobs = [(cols.name[i], cols.e[i], cols.f[i]) for i in range(len(cols.rows))]
+    return jobs, list(cols.rows), s2
+
+
+def save_fixture(path: str, xlsm: str, jobs: Sequence[upd.S1Job], s1_rows: Sequence[int], s2: Sequence[S2Tuple]):
+    """シート1は [行, C, E, F]、シート2は [行, A, B, C]（セルの値は str / int / float / None のまま）"""
+    data = {"xlsm": Path(xlsm).name,
+            "s1": [[r, n, e, f] for r, (n, e, f) in zip(s1_rows, jobs)],
+            "s2": [list(t) for t in s2]}
+    text = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    # mtime=0: 中身が同じなら同じバイト列（git の差分が出ない）
+    with open(path, "wb") as f:
+        f.write(gzip.compress(text.encode("utf-8"), compresslevel=9, mtime=0))
+
+
+def load_fixture(path: str, timer) -> Tuple[List[upd.S1Job], List[int], List[S2Tuple]]:
+    with timer.stage("read") as st:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            data = json.load(f)
+        jobs = [(n, e, f) for _r, n, e, f in data["s1"]]
+        s1_rows = [r for r, _n, _e, _f in data["s1"]]
+        s2 = [tuple(t) for t in data["s2"]]
+        st["rows"] = len(jobs) + len(s2)
+    return jobs, s1_rows, s2
+
+
+# ===== キー作成ルール =====
+RULES: Dict[str, Tuple[str, Callable[[Any], Any]]] = {
+    # 名前: (入力の種類, 関数)
+    "apply_dm_rule_on_e_for_key": ("e", lambda v: upd.apply_dm_rule_on_e_for_key(upd.nfkc_upper(upd.cell_to_text(v)))),
+    "apply_dm_rule_on_e_for_key(keep)": (
+        "e", lambda v: upd.apply_dm_rule_on_e_for_key(upd.nfkc_upper(upd.cell_to_text(v)), keep_dm_2223242526=True)),
+    "trim_after_second_slash_with_y_exception": (
+        "model", lambda v: upd.trim_after_second_slash_with_y_exception(upd.cell_to_text(v))),
+    "secret_rank": ("model", lambda v: upd.secret_rank(upd.cell_to_text(v))),
+    "model_strict": ("model", upd.model_strict),
+    "model_loose": ("model", upd.model_loose),
+    "s1_model_ef_for_key": ("ef", lambda ef: upd.s1_model_ef_for_key(*ef)),
+    "s2_model_raw_display": ("model", upd.s2_model_raw_display),
+    "norm_name": ("name", upd.norm_name),
+    "norm_name_raw_exact": ("name", lambda v: upd.norm_name_raw_exact(upd.cell_to_text(v))),
+    "has_rainbow_mark_raw": ("name", lambda v: upd.has_rainbow_mark_raw(upd.cell_to_text(v))),
+}
+
+
+def rule_inputs(jobs: Sequence[upd.S1Job], s2: Sequence[S2Tuple]) -> Dict[str, list]:
+    """実データに出てくる値の種類（出現順・重複なし）"""
+    def uniq(values):
+        return list(dict.fromkeys(values))
+    return {
+        "e": uniq(e for _n, e, _f in jobs),
+        "model": uniq([f for _n, _e, f in jobs] + [m for _r, _n, m, _p in s2]),
+        "ef": uniq((e, f) for _n, e, f in jobs),
+        "name": uniq([n for n, _e, _f in jobs] + [n for _r, n, _m, _p in s2]),
+    }
+
+
+def rule_digests(inputs: Dict[str, list]) -> Dict[str, dict]:
+    out = {}
+    for name, (kind, fn) in RULES.items():
+        vals = inputs[kind]
+        out[name] = {"inputs": len(vals), "sha256": _digest([fn(v) for v in vals])}
+    return out
+
+
+# ===== 価格ルール =====
+def legacy_price(s2_price: float) -> int:
+    """price_rules 導入前の calc_new_price_from_s2（比較用にそのまま残す）"""
+    s2_int = int(round(float(s2_price)))
+    if s2_int in (10, 30, 50):
+        return 10
+    if s2_int == 100:
+        return 50
+    base = int((s2_int * 95) // 100)
+    if base >= 100000:
+        return ((base + 9999) // 10000) * 10000
+    if base >= 10000:
+        return (base // 1000) * 1000
+    return (base // 100) * 100
+
+
+PRICE_EDGE_CASES = [
+    0, 0.5, 1.5, 2.5, 9, 10, 29.6, 30, 50, 99.5, 100, 100.5, 101, 105, 106,
+    10525, 10526, 10527, 10528, 105262, 105263, 105264, 105265, 10 ** 9,
+    -0.5, -1, -40, -99, -100, -101, -10526, -105264, -10 ** 7,
+]
+
+
+def price_mismatches(prices: Sequence[float]) -> List[Tuple[float, int, int, int]]:
+    """(S2金額, 旧式, apply, evaluate) が食い違うもの"""
+    rules = price_rules.PriceRules()
+    values = list(prices) + PRICE_EDGE_CASES
+    vec = [int(v) for v in rules.evaluate(values)]
+    out = []
+    for v, e in zip(values, vec):
+        want, got = legacy_price(v), rules.apply(v)
+        if got != want or e != want:
+            out.append((v, want, got, e))
+    return out
+
+
+# ===== 合成データ =====
+def _gen_name(name: Any, gen: int) -> Any:
+    if gen == 0 or name is None or str(name).strip() == "":
+        return name
+    return f"{name}・{gen + 1}式"
+
+
+def synthesize(n: int, jobs: Sequence[upd.S1Job], real_results, s2: Sequence[S2Tuple]):
+    """
+    シート1・シート2とも n 行の合成データ。
+    シート2はシート1の並び順でマッチ先の行を先に並べ（残りはその後ろ）、
+    1k のような小さいサイズでもマッチする組が入るようにする。
+    """
+    s2_by_row = {t[0]: t for t in s2}
+    order: List[int] = []
+    seen = set()
+    for r2, _sc, _p in real_results:
+        if r2 is not None and r2 not in seen:
+            seen.add(r2)
+            order.append(r2)
+    order += [t[0] for t in s2 if t[0] not in seen]
+
+    s1_jobs = []
+    for i in range(n):
+        name, e, f = jobs[i % len(jobs)]
+        s1_jobs.append((_gen_name(name, i // len(jobs)), e, f))
+    s2_rows = []
+    for j in range(n):
+        _r, name, model, price = s2_by_row[order[j % len(order)]]
+        gen = j // len(order)
+        if isinstance(price, (int, float)) and gen:
+            price = price + gen * 10
+        s2_rows.append((upd.S2_HEADER_ROWS + 1 + j, _gen_name(name, gen), model, price))
+    return s1_jobs, s2_rows
+
+
+# ===== 1データセット分の実行 =====
+def run_dataset(label: str, jobs: Sequence[upd.S1Job], s2: Sequence[S2Tuple], timer, workers: int):
+    upd.STATS.reset()
+    with timer.stage(f"{label}:s2_index") as st:
+        s2_index = upd.build_s2_indexes_from_rows(iter(s2))
+        st["rows"] = len(s2)
+    with timer.stage(f"{label}:match") as st:
+        results = upd.match_s1_rows(list(jobs), s2_index, workers=workers)
+        st["rows"] = len(jobs)
+    with timer.stage(f"{label}:price") as st:
+        s2_rows = s2_index[2]
+        prices = [s2_rows[r2].price for r2, _sc, _p in results if r2 is not None and s2_rows[r2].price is not None]
+        price_rules.PriceRules().evaluate(prices)
+        st["rows"] = len(prices)
+    return results, upd.STATS.as_dict()
+
+
+def _first_diffs(rows: Sequence[int], got: Sequence[list], want: Sequence[list], limit: int = 10) -> List[str]:
+    out = []
+    for r, g, w in zip(rows, got, want):
+        if g != w:
+            out.append(f"      row {r}: golden {w} → now {g}")
+            if len(out) >= limit:
+                break
+    return out
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="値段更新のマッチングエンジンのベンチ + ゴールデンチェック")
+    ap.add_argument("--fixture", default=FIXTURE_PATH, help="固定入力（シート1 C/E/F・シート2 A〜C）")
+    ap.add_argument("--xlsm", default=None, help="固定入力の代わりにこのブックを直接読む")
+    ap.add_argument("--fixture-from", default=None, metavar="XLSM", help="このブックから固定入力を作り直す")
+    ap.add_argument("--golden", default=GOLDEN_PATH)
+    ap.add_argument("--sizes", default=",".join(str(n) for n in DEFAULT_SIZES),
+                    help="合成データの行数（カンマ区切り、空なら合成データなし）")
+    ap.add_argument("--workers", type=int, default=1)
+    ap.add_argument("--freeze", action="store_true", help="現在の結果でゴールデンを書き直す")
+    args = ap.parse_args()
+
+    sizes = [int(x) for x in args.sizes.split(",") if x.strip()]
+    timer = upd.StageTimer()
+
+    if args.fixture_from:
+        jobs, s1_rows, s2 = load_real(args.fixture_from, timer)
+        save_fixture(args.fixture, args.fixture_from, jobs, s1_rows, s2)
+        print(f"[fixture] {args.fixture} ← {args.fixture_from}（シート1 {len(jobs)} 行 / シート2 {len(s2)} 行）")
+    elif args.xlsm:
+        jobs, s1_rows, s2 = load_real(args.xlsm, timer)
+    else:
+        if not Path(args.fixture).exists():
+            print(f"[err] 固定入力がありません: {args.fixture}（--fixture-from buylist.xlsm で作成）")
+            return 1
+        jobs, s1_rows, s2 = load_fixture(args.fixture, timer)
+    source = args.fixture_from or args.xlsm or args.fixture
+    input_sha = _digest([jobs, s2])
+    real_results, real_stats = run_dataset("real", jobs, s2, timer, args.workers)
+    real_rows = _result_rows(real_results)
+    rules = rule_digests(rule_inputs(jobs, s2))
+
+    synth: Dict[str, dict] = {}
+    synth_stats: Dict[str, dict] = {}
+    for n in sizes:
+        sj, ss = synthesize(n, jobs, real_results, s2)
+        res, stats = run_dataset(f"synth{n}", sj, ss, timer, args.workers)
+        synth[str(n)] = {"matched": sum(1 for r2, _sc, _p in res if r2 is not None),
+                         "sha256": _digest(_result_rows(res))}
+        synth_stats[str(n)] = stats
+
+    print(f"[bench] input={source} workers={args.workers}")
+    for line in timer.summary_lines():
+        print(line)
+    for label, stats in [("real", real_stats)] + [(f"synth{n}", synth_stats[n]) for n in synth_stats]:
+        avg = " ".join(f"{p}={v:.2f}" for p, v in stats["avg_candidates"].items())
+        print(f"   {label:<12} SequenceMatcher calls {stats['ratio_calls']:>7}  avg candidates {avg}")
+
+    golden_now = {
+        "input": Path(source).name,
+        "input_sha256": input_sha,
+        "rules": rules,
+        "synthetic": synth,
+        "real": {"matched": sum(1 for r in real_rows if r[0] is not None),
+                 "rows": [[r] + res for r, res in zip(s1_rows, real_rows)]},
+    }
+
+    if args.freeze:
+        # real の行は1行1件で書く（差分が読めるように）
+        with open(args.golden, "w", encoding="utf-8", newline="\n") as f:
+            f.write(json.dumps({k: v for k, v in golden_now.items() if k != "real"},
+                               ensure_ascii=False, indent=1)[:-2])
+            f.write(',\n "real": {"matched": %d, "rows": [\n' % golden_now["real"]["matched"])
+            f.write(",\n".join(json.dumps(r, ensure_ascii=False) for r in golden_now["real"]["rows"]))
+            f.write("\n ]}\n}\n")
+        synth_matched = ", ".join(f"{n}:{v['matched']}" for n, v in synth.items())
+        print(f"[freeze] {args.golden}  real matched {golden_now['real']['matched']} / {len(real_rows)}"
+              f"  synthetic {synth_matched}")
+        return 0
+
+    if not Path(args.golden).exists():
+        print(f"[err] ゴールデンがありません: {args.golden}（--freeze で作成）")
+        return 1
+    golden = json.loads(Path(args.golden).read_text(encoding="utf-8"))
+    if golden.get("input_sha256") != input_sha:
+        print("[golden] 入力（シート1の C/E/F列・シート2）がゴールデン固定時と違うため比較できません。"
+              "固定入力を取り直したなら --freeze でゴールデンも取り直してください。")
+        return 2
+
+    failed = 0
+    g_rows = golden["real"]["rows"]
+    want = [r[1:] for r in g_rows]
+    if [r[0] for r in g_rows] != s1_rows or want != real_rows:
+        n_diff = sum(1 for g, w in zip(real_rows, want) if g != w)
+        print(f"[golden] real: NG（{n_diff} 行が変化）")
+        for line in _first_diffs(s1_rows, real_rows, want):
+            print(line)
+        failed += 1
+    else:
+        print(f"[golden] real: OK（{len(real_rows)} 行 / matched {golden['real']['matched']}）")
+
+    for name, d in rules.items():
+        g = golden["rules"].get(name)
+        if g != d:
+            print(f"[golden] rule {name}: NG（inputs {d['inputs']}）")
+            failed += 1
+    if not failed:
+        print(f"[golden] rules: OK（{len(rules)} 関数）")
+
+    s2_prices = [v for v in (upd.to_number(p) for _r, _n, _m, p in s2) if v is not None]
+    bad_prices = price_mismatches(s2_prices)
+    if bad_prices:
+        print(f"[golden] price: NG（{len(bad_prices)} 件が旧式と不一致）")
+        for v, want, got, e in bad_prices[:10]:
+            print(f"      S2={v!r}: 旧式 {want} / apply {got} / evaluate {e}")
+        failed += 1
+    else:
+        print(f"[golden] price: OK（旧式と一致 / {len(s2_prices) + len(PRICE_EDGE_CASES)} 件）")
+
+    for n, d in synth.items():
+        g = golden["synthetic"].get(n)
+        if g is None:
+            print(f"[golden] synth{n}: 固定結果なし（比較せず）")
+        elif g != d:
+            print(f"[golden] synth{n}: NG（matched {g['matched']} → {d['matched']}）")
+            failed += 1
+        else:
+            print(f"[golden] synth{n}: OK（matched {d['matched']}）")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,173 @@
+﻿# -*- coding: utf-8 -*-
+r"""
+値段更新.py の名前マッチング（match_s1_row）マイクロベンチ
+
+- 対象: 実ブック（既定: buylist.xlsm）のシート1 × シート2
+- before: 全候補に SequenceMatcher.ratio（NAME_PREFILTER=False）
+- after : 文字多重集合の共通数による上限で足切りし、残りだけ ratio_to（シート2名側の
+          SequenceMatcher を使い回す）で計算（NAME_PREFILTER=True）
+- 実データはほとんどが名前完全一致で決まり候補も1〜数件なので、追加で
+    --fuzz    : S1 名を1文字ずつ欠けさせて類似度判定に回す
+    --crowd K : 各 S1 名を実シート2からランダムに選んだ K 件の候補と採点する（候補が多い型番を想定）
+  も測る
+- before/after のマッチ結果（行番号・スコア）が1件でも違えば終了コード1
+
+使い方:
+  python bench_name_match.py
+  python bench_name_match.py --xlsm buylist.xlsm --repeat 5 --fuzz --crowd 200
+"""
+
+import argparse
+import importlib
+import random
+import time
+from pathlib import Path
+from typing import Any, List, Tuple
+
+from openpyxl import load_workbook
+
+upd = importlib.import_module("値段更新")
+
+
+def load_rows(xlsm: str):
+    wb = load_workbook(xlsm, read_only=True, data_only=False)
+    try:
+        cols = upd.read_s1_columns(wb[upd.SHEET1])
+        s1: List[Tuple[Any, Any, Any]] = [
+            (cols.name[i], cols.e[i], cols.f[i])
+            for i in range(len(cols.rows)) if not upd.is_checked_cell(cols.lock[i])
+        ]
+        s2 = list(upd.iter_s2_rows(wb[upd.SHEET2]))
+        return s1, s2
+    finally:
+        wb.close()
+
+
+def fuzz_names(s1, seed: int = 0):
+    """S1名から1文字を落とす（完全一致を外して類似度判定に回す）"""
+    rnd = random.Random(seed)
+    out = []
+    for name, e, f in s1:
+        s = "" if name is None else str(name)
+        if len(s) > 3:
+            i = rnd.randrange(len(s))
+            s = s[:i] + s[i + 1:]
+        out.append((s, e, f))
+    return out
+
+
+def run(s1, idx, prefilter: bool, repeat: int):
+    upd.NAME_PREFILTER = prefilter
+    calls = [0]
+    orig_ratio, orig_ratio_to = upd.ratio, upd.ratio_to
+
+    def counting(fn):
+        def wrapped(a: str, b: str) -> float:
+            calls[0] += 1
+            return fn(a, b)
+        return wrapped
+
+    # 名前スコアリング（pick_best_by_name_with_rainbow_preference）だけの所要時間も測る
+    pick_time = [0.0]
+    orig_pick = upd.pick_best_by_name_with_rainbow_preference
+
+    def timed_pick(*a, **kw):
+        t = time.perf_counter()
+        try:
+            return orig_pick(*a, **kw)
+        finally:
+            pick_time[0] += time.perf_counter() - t
+
+    upd.ratio, upd.ratio_to = counting(orig_ratio), counting(orig_ratio_to)
+    upd.pick_best_by_name_with_rainbow_preference = timed_pick
+    try:
+        best = (float("inf"), float("inf"))
+        results = []
+        for _ in range(repeat):
+            calls[0] = 0
+            pick_time[0] = 0.0
+            t0 = time.perf_counter()
+            results = [upd.match_s1_row(name, e, f, *idx) for name, e, f in s1]
+            best = min(best, (pick_time[0], time.perf_counter() - t0))
+        return best, calls[0], results
+    finally:
+        upd.ratio, upd.ratio_to = orig_ratio, orig_ratio_to
+        upd.pick_best_by_name_with_rainbow_preference = orig_pick
+        upd.NAME_PREFILTER = True
+
+
+def run_crowd(s1, idx, k: int, prefilter: bool, repeat: int, seed: int = 0):
+    """pick_best_by_name_with_rainbow_preference を K 件の候補で直接呼ぶ"""
+    s2_rows = idx[2]
+    keys = sorted(s2_rows)
+    rnd = random.Random(seed)
+    jobs = []
+    for name, _e, _f in s1:
+        s = "" if name is None else str(name).strip()
+        jobs.append((upd.norm_name(s), upd.norm_name_raw_exact(s), upd.has_rainbow_mark_raw(s),
+                     rnd.sample(keys, min(k, len(keys)))))
+    upd.NAME_PREFILTER = prefilter
+    try:
+        best = float("inf")
+        results = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            results = [upd.pick_best_by_name_with_rainbow_preference(
+                cand, n, ex, rb, s2_rows, min_score=upd.NAME_REQUIRED_FOR_LOOSE) for n, ex, rb, cand in jobs]
+            best = min(best, time.perf_counter() - t0)
+        # 合格ライン未満は不採用なので、採否と採用行だけを比べる
+        return best, [(r2, sc) if (r2 is not None and sc >= upd.NAME_REQUIRED_FOR_LOOSE) else None
+                      for r2, sc in results]
+    finally:
+        upd.NAME_PREFILTER = True
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="名前マッチングのマイクロベンチ（before/after）")
+    ap.add_argument("--xlsm", default=upd.XLSM_PATH)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--fuzz", action="store_true", help="S1名を1文字欠けさせた条件も測る")
+    ap.add_argument("--crowd", type=int, default=0, metavar="K", help="候補 K 件での名前採点も測る")
+    args = ap.parse_args()
+
+    if not Path(args.xlsm).exists():
+        print(f"[err] not found: {args.xlsm}")
+        return 1
+
+    s1, s2 = load_rows(args.xlsm)
+    idx = upd.build_s2_indexes_from_rows(s2)
+    cases = [("real", s1)]
+    if args.fuzz:
+        cases.append(("fuzz", fuzz_names(s1)))
+
+    print(f"[bench] s1 rows={len(s1)} s2 rows={len(s2)} repeat={args.repeat} xlsm={args.xlsm}")
+    mismatched = 0
+    for label, rows in cases:
+        t_before, n_before, res_before = run(rows, idx, False, args.repeat)
+        t_after, n_after, res_after = run(rows, idx, True, args.repeat)
+        diff = sum(1 for a, b in zip(res_before, res_after) if a != b)
+        mismatched += diff
+        matched = sum(1 for r2, _sc in res_after if r2 is not None)
+        print(f"  [{label}] matched={matched} mismatched={diff}")
+        print(f"     before (ratio for all)  : name scoring {t_before[0] * 1000:8.1f} ms"
+              f" / match total {t_before[1] * 1000:8.1f} ms  ratio calls={n_before}")
+        print(f"     after  (upper-bound cut): name scoring {t_after[0] * 1000:8.1f} ms"
+              f" / match total {t_after[1] * 1000:8.1f} ms  ratio calls={n_after}")
+        if t_after[0] > 0:
+            print(f"     name scoring speed-up: x{t_before[0] / t_after[0]:.2f}")
+
+    if args.crowd > 0:
+        t_before, res_before = run_crowd(s1, idx, args.crowd, False, args.repeat)
+        t_after, res_after = run_crowd(s1, idx, args.crowd, True, args.repeat)
+        diff = sum(1 for a, b in zip(res_before, res_after) if a != b)
+        mismatched += diff
+        print(f"  [crowd k={args.crowd}] accepted={sum(1 for x in res_after if x)} mismatched={diff}")
+        print(f"     before (ratio for all)  : {t_before * 1000:9.1f} ms")
+        print(f"     after  (upper-bound cut): {t_after * 1000:9.1f} ms")
+        if t_after > 0:
+            print(f"     speed-up: x{t_before / t_after:.2f}")
+    return 1 if mismatched else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,133 @@
+﻿# -*- coding: utf-8 -*-
+r"""
+CardRush 取得結果のスナップショット保存（SQLite・標準ライブラリのみ）
+
+- 1回のクロール = snapshots の1行 + items の N 行
+- 文字列列（カード名/型番/カテゴリ/レア/正規化名）は strings 表への整数IDで保持（辞書エンコード）
+- 金額は INTEGER、items は (snapshot_id, seq) 主キーの WITHOUT ROWID 表
+- items_v ビューで文字列に戻して参照できる（価格履歴の照会用）
+
+例:
+  SELECT s.taken_at, v.amount FROM items_v v JOIN snapshots s ON s.id = v.snapshot_id
+   WHERE v.name_norm = '...' AND v.model_number = '...' ORDER BY s.id;
+"""
+
+import os
+import sqlite3
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS strings(
+  id INTEGER PRIMARY KEY,
+  s  TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS snapshots(
+  id       INTEGER PRIMARY KEY,
+  taken_at TEXT    NOT NULL,
+  rows     INTEGER NOT NULL,
+  source   TEXT    NOT NULL DEFAULT ''
+);
+CREATE TABLE IF NOT EXISTS items(
+  snapshot_id INTEGER NOT NULL,
+  seq         INTEGER NOT NULL,
+  name_id     INTEGER NOT NULL,
+  model_id    INTEGER NOT NULL,
+  amount      INTEGER NOT NULL,
+  category_id INTEGER NOT NULL,
+  rarity_id   INTEGER NOT NULL,
+  norm_id     INTEGER NOT NULL,
+  PRIMARY KEY(snapshot_id, seq)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS items_card ON items(norm_id, model_id, snapshot_id);
+CREATE VIEW IF NOT EXISTS items_v AS
+  SELECT i.snapshot_id, i.seq,
+         n.s AS name, m.s AS model_number, i.amount,
+         c.s AS category, r.s AS rarity, nn.s AS name_norm
+    FROM items i
+    JOIN strings n  ON n.id  = i.name_id
+    JOIN strings m  ON m.id  = i.model_id
+    JOIN strings c  ON c.id  = i.category_id
+    JOIN strings r  ON r.id  = i.rarity_id
+    JOIN strings nn ON nn.id = i.norm_id;
+"""
+
+# スナップショット1行 = (name, model_number, amount, category, rarity, name_norm)
+SnapshotRow = Tuple[str, str, int, str, str, str]
+
+
+def connect(path: str) -> sqlite3.Connection:
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    con = sqlite3.connect(path)
+    con.execute("PRAGMA journal_mode=WAL")
+    con.executescript(SCHEMA)
+    return con
+
+
+def _intern(con: sqlite3.Connection, cache: Dict[str, int], values: Iterable[str]):
+    new = sorted({v for v in values if v not in cache})
+    if new:
+        con.executemany("INSERT OR IGNORE INTO strings(s) VALUES (?)", ((v,) for v in new))
+        for i in range(0, len(new), 500):
+            chunk = new[i:i + 500]
+            q = "SELECT s, id FROM strings WHERE s IN (%s)" % ",".join("?" * len(chunk))
+            cache.update(con.execute(q, chunk).fetchall())
+
+
+def write_snapshot(path: str, rows: Sequence[Sequence[Any]], source: str = "") -> int:
+    """
+    cardrush_to_excel の行（[name, model, amount, category, rarity, url, name_norm]）を1スナップショットとして保存。
+    戻り値は snapshot_id。
+    """
+    recs: List[SnapshotRow] = []
+    for r in rows:
+        name, model, amount, category, rarity, _url, norm = (list(r) + [""] * 7)[:7]
+        recs.append((str(name or ""), str(model or ""), int(amount or 0),
+                     str(category or ""), str(rarity or ""), str(norm or "")))
+
+    con = connect(path)
+    try:
+        with con:
+            cache: Dict[str, int] = {}
+            _intern(con, cache, (v for rec in recs for v in (rec[0], rec[1], rec[3], rec[4], rec[5])))
+            cur = con.execute("INSERT INTO snapshots(taken_at, rows, source) VALUES (?, ?, ?)",
+                              (time.strftime("%Y-%m-%d %H:%M:%S"), len(recs), source))
+            sid = cur.lastrowid
+            con.executemany(
+                "INSERT INTO items(snapshot_id, seq, name_id, model_id, amount, category_id, rarity_id, norm_id)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                ((sid, seq, cache[n], cache[m], a, cache[c], cache[rr], cache[nn])
+                 for seq, (n, m, a, c, rr, nn) in enumerate(recs)),
+            )
+        return sid
+    finally:
+        con.close()
+
+
+def latest_snapshot_id(con: sqlite3.Connection) -> Optional[int]:
+    row = con.execute("SELECT MAX(id) FROM snapshots").fetchone()
+    return row[0] if row and row[0] is not None else None
+
+
+def load_snapshot(path: str, snapshot_id: Optional[int] = None) -> Tuple[Optional[int], List[SnapshotRow]]:
+    """スナップショットを取得順（seq順）で読み出す。snapshot_id 省略時は最新。"""
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"snapshot db not found: {path}")
+    con = sqlite3.connect(path)
+    try:
+        sid = snapshot_id if snapshot_id is not None else latest_snapshot_id(con)
+        if sid is None:
+            return None, []
+        strings = dict(con.execute(
+            "SELECT id, s FROM strings WHERE id IN ("
+            " SELECT name_id FROM items WHERE snapshot_id=:sid UNION SELECT model_id FROM items WHERE snapshot_id=:sid"
+            " UNION SELECT category_id FROM items WHERE snapshot_id=:sid UNION SELECT rarity_id FROM items WHERE snapshot_id=:sid"
+            " UNION SELECT norm_id FROM items WHERE snapshot_id=:sid)", {"sid": sid}).fetchall())
+        cur = con.execute(
+            "SELECT name_id, model_id, amount, category_id, rarity_id, norm_id FROM items"
+            " WHERE snapshot_id=? ORDER BY seq", (sid,))
+        rows = [(strings[n], strings[m], a, strings[c], strings[r], strings[nn]) for n, m, a, c, r, nn in cur]
+        return sid, rows
+    finally:
+        con.close()
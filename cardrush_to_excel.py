@@ -7,18 +7,37 @@ CardRush（デュエル・マスターズ）買取表 → Excelファイル直
 - (name, model_number) で重複排除（(虹)/(虹アイコン) を同一扱いの正規化名で判定）
 - レコード末尾に『比較用カード名（正規化名）』を付与
 - リトライ & ジッター付きスリープ、UAローテーション、Cookie取得
+- HTTPセッションはクロール全体で共有（Cookie取得は1回、keep-alive、403時のみUA+セッションを作り直し）
+- --incremental: ページごとの内容ハッシュ/ETag/Last-Modified を状態ファイルに保存し、条件付きリクエストで取得。
+  全ページ無変更ならExcelを書き換えず終了コード3（EXIT_UNCHANGED）で終了
+  --pending-state を付けると変更ありの状態は <状態ファイル>.new に置くだけにし、後続（価格更新・WEBビルド・push）が
+  全部成功してから --commit-state で確定する。途中で失敗したら状態は前回のままなので、次回も「変更あり」で全工程をやり直す
+- --snapshot-db PATH で取得結果をSQLiteの列指向スナップショットとして追記（価格履歴・値段更新.py の高速読込用）
+- --record DIR で生レスポンスをページごとに保存、--driver replay --replay-dir DIR でオフライン再生
+  （遅延・403注入あり。取得→重複排除→Excel書き込みをサイトに触れずにプロファイルできる）
+- playwright は1回の実行で Chromium を1つだけ起動し、タブを使い回す（画像/フォント/CSSはブロック）
+- --concurrency N でページを並列取得（全体のレート上限は --max-rps、結果はページ順にマージ）
+- リクエスト間隔は全ワーカー共通のAIMDトークンバケットで制御（2xxで加速、403/429/Retry-Afterで急減速）
 - .xls は Windows + Excel(pywin32) で .xlsm に自動変換 → openpyxl で書き込み
+- 既存シートへの書き込みは既定で「シートXMLだけ差し替え」（--writer stream。他パーツは圧縮バイトのままコピー）
 - 取得0件/しきい値未満は終了コード2で失敗（--min-rows）
 - パスはNFC正規化、保存後のサイズ/mtimeをログ出力（--debug）
 """
 
 import argparse
+import asyncio
+import hashlib
 import json
 import os
 import re
 import time
 import random
+import threading
 import unicodedata
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from itertools import chain
 from typing import Any, Dict, Iterable, List, Tuple, Optional, Set
 
 import requests
@@ -30,16 +49,34 @@ from urllib.parse import urlencode
 from openpyxl import load_workbook, Workbook
 from openpyxl.utils.exceptions import InvalidFileException
 
+import cardrush_snapshot
+import xlsm_zip
+
 # ---- Playwright (任意) ----
 try:
-    from playwright.sync_api import sync_playwright
+    from playwright.async_api import async_playwright
 except Exception:
-    sync_playwright = None
+    async_playwright = None
 
 BASE_URL = "https://cardrush.media/duel_masters/buying_prices"
 DEFAULT_LIMIT = 120
 DEFAULT_MAX_PAGES = 200
 DEFAULT_SLEEP_MS = 400
+DEFAULT_CONCURRENCY = 1
+DEFAULT_MAX_RPS = 4.0
+DEFAULT_MIN_RPS = 0.1
+DEFAULT_STATE_FILE = ".cardrush_state.json"
+PENDING_STATE_SUFFIX = ".new"  # --pending-state の保存先（--commit-state で DEFAULT_STATE_FILE に昇格）
+DEFAULT_WRITER = "stream"
+
+SHEET_HEADER = ["カード名", "型番", "買取金額(円)", "カテゴリ", "レア", "取得元URL", "比較用カード名"]
+
+# 終了コード（2=失敗 / 3=全ページ無変更でExcel書き込みをスキップ）
+EXIT_FAILED = 2
+EXIT_UNCHANGED = 3
+
+# 差分判定・キャッシュに使うアイテムのキー（items_to_rows が参照するものだけ）
+ITEM_KEYS = ("name", "model_number", "amount", "rarity", "display_category")
 
 # ベースUA
 UA = (
@@ -56,6 +93,9 @@ UAS = [
     "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36",
 ]
 
+# Playwright でブロックするリソース種別
+PW_BLOCK_RESOURCE_TYPES = frozenset(["image", "font", "stylesheet", "media"])
+
 HEADERS_BASE = {
     "Accept": "text/html,application/xhtml+xml,application/json;q=0.9,*/*;q=0.8",
     "Accept-Language": "ja,en;q=0.8",
@@ -112,7 +152,7 @@ def normalize_name_for_dedup(name: str) -> str:
     return s.lower()
 
 # ---------- HTTP (requests) ----------
-def make_session(ua: Optional[str] = None) -> requests.Session:
+def make_session(ua: Optional[str] = None, pool_size: int = 10) -> requests.Session:
     s = requests.Session()
     s.headers.update({**HEADERS_BASE, "User-Agent": ua or random.choice(UAS)})
     # 403はアプリ側で制御するので自動リトライは薄めに
@@ -123,9 +163,106 @@ def make_session(ua: Optional[str] = None) -> requests.Session:
         allowed_methods=frozenset(["GET"]),
         raise_on_status=False,
     )
-    s.mount("https://", HTTPAdapter(max_retries=retry))
+    s.mount("https://", HTTPAdapter(max_retries=retry, pool_connections=1, pool_maxsize=max(1, pool_size)))
     return s
 
+def _session_connections(sess: requests.Session) -> int:
+    """セッションが張った接続数（= TLSハンドシェイク数の目安）"""
+    n = 0
+    for adapter in sess.adapters.values():
+        try:
+            pools = adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                n += getattr(pool, "num_connections", 0) if pool is not None else 0
+        except Exception:
+            pass
+    return n
+
+class SessionManager:
+    """
+    クロール全体で1つのセッションを共有する。
+    - Cookie取得（トップへのGET）はセッション生成時に1回だけ
+    - 接続はHTTPAdapterのプールで使い回す（keep-alive）
+    - 403を受けたときだけUAを変えてセッションを作り直す
+    """
+    def __init__(self, pool_size: int = 10, timeout: float = 20.0, debug: bool = False):
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.debug = debug
+        self._lock = threading.Lock()
+        self._sess: Optional[requests.Session] = None
+        self._gen = 0
+        self.ua = ""
+        # 統計
+        self.page_requests = 0
+        self.warmups = 0
+        self.sessions = 0
+        self.rotations = 0
+        self._closed_connections = 0
+
+    def get(self) -> Tuple[requests.Session, int]:
+        with self._lock:
+            if self._sess is None:
+                self._open()
+            return self._sess, self._gen
+
+    def _open(self):
+        self.ua = random.choice(UAS)
+        sess = make_session(self.ua, pool_size=self.pool_size)
+        # 事前にトップを踏んでCookie獲得（失敗しても続行）
+        try:
+            sess.get(BASE_URL, timeout=self.timeout)
+        except Exception:
+            pass
+        self.warmups += 1
+        self.sessions += 1
+        self._gen += 1
+        self._sess = sess
+        if self.debug:
+            print(f"[debug] session#{self.sessions} opened ua={self.ua[:40]}...")
+
+    def rotate(self, gen: int):
+        """403後に呼ぶ。既に他ワーカーが作り直していれば何もしない。"""
+        with self._lock:
+            if gen != self._gen or self._sess is None:
+                return
+            self._close_current()
+            self.rotations += 1
+
+    def _close_current(self):
+        if self._sess is None:
+            return
+        self._closed_connections += _session_connections(self._sess)
+        try:
+            self._sess.close()
+        except Exception:
+            pass
+        self._sess = None
+
+    def count_request(self):
+        with self._lock:
+            self.page_requests += 1
+
+    def close(self):
+        with self._lock:
+            self._close_current()
+
+    def handshakes(self) -> int:
+        with self._lock:
+            live = _session_connections(self._sess) if self._sess is not None else 0
+            return self._closed_connections + live
+
+    def report(self) -> str:
+        # 従来方式は1試行ごとに「新規セッション + Cookie取得GET + 本GET」
+        old_requests = self.page_requests * 2
+        old_handshakes = self.page_requests
+        new_requests = self.page_requests + self.warmups
+        hs = self.handshakes()
+        return (f"http: requests={new_requests} (page={self.page_requests} warmup={self.warmups}) "
+                f"sessions={self.sessions} rotations={self.rotations} handshakes~={hs} / "
+                f"saved requests={old_requests - new_requests} handshakes~={max(0, old_handshakes - hs)}")
+
 def build_params(page: int, limit: int, hot_only: bool) -> List[Tuple[str, str]]:
     params = [
         ("displayMode", "リスト"),
@@ -198,7 +335,100 @@ def parse_items_from_json(obj: Any) -> List[Dict[str, Any]]:
         return _deep_find_items_array(obj)
     return []
 
+# ---------- __NEXT_DATA__ 高速抽出 ----------
+_NEXT_DATA_ID = "__NEXT_DATA__"
+_NEXT_DATA_ID_ATTR = re.compile(r"""\sid\s*=\s*(["']?)__NEXT_DATA__\1(?=[\s/>]|$)""", re.I)
+_ITEMS_PATH_LOCK = threading.Lock()
+_items_path_cache: Optional[Tuple[Any, ...]] = None  # 前回アイテム配列が見つかったJSONパス
+
+def _extract_next_data_text(html_text: str) -> Optional[str]:
+    """
+    <script id="__NEXT_DATA__">…</script> の中身を文字列走査で切り出す（DOMは組み立てない）。
+    __NEXT_DATA__ が <script> の開始タグの id 属性にあるものだけ対象（本文で window.__NEXT_DATA__ を
+    参照するだけのスクリプトは除く）。見つからなければ None。
+    """
+    pos = html_text.find(_NEXT_DATA_ID)
+    while pos != -1:
+        tag_start = html_text.rfind("<", 0, pos)
+        tag_end = html_text.find(">", pos)
+        if (tag_start != -1 and tag_end != -1 and html_text[tag_start:tag_start + 7].lower() == "<script"
+                and ">" not in html_text[tag_start:pos]
+                and _NEXT_DATA_ID_ATTR.search(html_text, tag_start + 7, tag_end + 1)):
+            body_start = tag_end + 1
+            body_end = html_text.find("</script", body_start)
+            if body_end == -1:
+                return None
+            return html_text[body_start:body_end]
+        pos = html_text.find(_NEXT_DATA_ID, pos + len(_NEXT_DATA_ID))
+    return None
+
+def _follow_path(o: Any, path: Tuple[Any, ...]) -> Any:
+    for k in path:
+        if isinstance(o, dict) and isinstance(k, str):
+            o = o.get(k)
+        elif isinstance(o, list) and isinstance(k, int) and 0 <= k < len(o):
+            o = o[k]
+        else:
+            return None
+    return o
+
+def _locate_list_path(o: Any, target: Dict[str, Any]) -> Optional[Tuple[Any, ...]]:
+    """target（アイテムdict）を要素に持つlistのパスを同一性で探す"""
+    stack: List[Tuple[Any, Tuple[Any, ...]]] = [(o, ())]
+    while stack:
+        x, path = stack.pop()
+        if isinstance(x, list):
+            if any(e is target for e in x):
+                return path
+            for i, e in enumerate(x):
+                if isinstance(e, (dict, list)):
+                    stack.append((e, path + (i,)))
+        elif isinstance(x, dict):
+            for k, v in x.items():
+                if isinstance(v, (dict, list)):
+                    stack.append((v, path + (k,)))
+    return None
+
+def _items_by_cached_path(data: Any) -> List[Dict[str, Any]]:
+    path = _items_path_cache
+    if path is None:
+        return []
+    lst = _follow_path(data, path)
+    if not isinstance(lst, list):
+        return []
+    dicts = [e for e in lst if isinstance(e, dict)]
+    if dicts and any(_looks_like_item_dict(dd) for dd in dicts):
+        return dicts
+    return []
+
 def parse_items_from_next_data(html_text: str) -> List[Dict[str, Any]]:
+    """
+    高速パス: 文字列走査で __NEXT_DATA__ を切り出し、前回学習したJSONパスでアイテム配列を引く。
+    パスが外れたときだけ従来の深さ優先探索にフォールバックし、見つかったパスを学習し直す。
+    """
+    global _items_path_cache
+    txt = _extract_next_data_text(html_text)
+    if txt is None:
+        # 文字列自体が無ければDOMを組んでも見つからない
+        return parse_items_from_next_data_soup(html_text) if _NEXT_DATA_ID in html_text else []
+    txt = txt.strip()
+    try:
+        data = json.loads(txt)
+    except Exception:
+        # 切り出しが崩れている（属性の書き方が想定外など）ときは DOM で取り直す
+        return parse_items_from_next_data_soup(html_text)
+    items = _items_by_cached_path(data)
+    if items:
+        return items
+    items = parse_items_from_json(data)
+    if items:
+        path = _locate_list_path(data, items[0])
+        with _ITEMS_PATH_LOCK:
+            _items_path_cache = path
+    return items
+
+def parse_items_from_next_data_soup(html_text: str) -> List[Dict[str, Any]]:
+    """従来方式（BeautifulSoupで全体をパース）。高速パスで見つからない場合とベンチマーク比較用。"""
     soup = BeautifulSoup(html_text, "html.parser")
     tag = soup.find("script", id="__NEXT_DATA__")
     if not tag or not tag.text:
@@ -209,20 +439,353 @@ def parse_items_from_next_data(html_text: str) -> List[Dict[str, Any]]:
         return []
     return parse_items_from_json(data)
 
-# ---------- 1ページ取得（requests + 再試行） ----------
-def fetch_page_requests(page: int, limit: int, hot_only: bool, timeout: float = 20.0, debug: bool=False):
-    for attempt in range(1, 6):  # 最大5回、指数バックオフ
-        ua = random.choice(UAS)
-        sess = make_session(ua)
-        # 事前にトップを踏んでCookie獲得（失敗しても続行）
+def parse_items_from_text(txt: str, debug: bool=False) -> List[Dict[str, Any]]:
+    """レスポンス本文（JSON または HTML）からアイテム配列を取り出す"""
+    txt = (txt or "").strip()
+    if txt.startswith("{") or txt.startswith("["):
         try:
-            sess.get(BASE_URL, timeout=timeout)
-        except Exception:
+            items = parse_items_from_json(json.loads(txt))
+            if items:
+                return items
+        except Exception as e:
+            if debug:
+                print(f"[debug] json parse error: {e}")
+    return parse_items_from_next_data(txt)
+
+# ---------- レート制御（全ワーカー共通・AIMD） ----------
+def parse_retry_after(v: Optional[str]) -> Optional[float]:
+    """Retry-After（秒 or HTTP-date）→ 秒。解釈できなければ None。"""
+    if not v:
+        return None
+    v = v.strip()
+    if v.isdigit():
+        return float(v)
+    try:
+        return max(0.0, parsedate_to_datetime(v).timestamp() - time.time())
+    except Exception:
+        return None
+
+class AdaptiveRateLimiter:
+    """
+    全ワーカー共有のトークンバケット（AIMD）。
+    - acquire(): 1リクエスト分のトークンを待って取得（クールダウン中はその終了まで待つ）
+    - 2xx/304 ごとに rate を increase だけ加算（max_rps まで）
+    - 403/429 で rate を decrease 倍に減らし、Retry-After（無ければ連続回数に応じた指数）だけ全体を止める
+    adaptive=False なら rate は固定（従来の一定間隔と同じ）。
+    """
+    def __init__(self, rate: float, max_rps: float = DEFAULT_MAX_RPS, min_rps: float = DEFAULT_MIN_RPS,
+                 increase: float = 0.1, decrease: float = 0.5, max_cooldown: float = 60.0,
+                 adaptive: bool = True, debug: bool = False):
+        self.max_rps = max(min_rps, max_rps)
+        self.min_rps = min_rps
+        self.rate = min(self.max_rps, max(min_rps, rate))
+        self.increase = increase
+        self.decrease = decrease
+        self.max_cooldown = max_cooldown
+        self.adaptive = adaptive
+        self.debug = debug
+        self._lock = threading.Lock()
+        self._tokens = 1.0
+        self._last = time.monotonic()
+        self._blocked_until = 0.0
+        self._consecutive = 0
+        # 統計
+        self.successes = 0
+        self.throttles = 0
+        self.lowest = self.rate
+        self.highest = self.rate
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self._blocked_until:
+                    delay = self._blocked_until - now
+                else:
+                    self._tokens = min(1.0, self._tokens + (now - self._last) * self.rate)
+                    self._last = now
+                    if self._tokens >= 1.0:
+                        self._tokens -= 1.0
+                        return
+                    delay = (1.0 - self._tokens) / self.rate
+            time.sleep(delay * random.uniform(1.0, 1.2))
+
+    def on_success(self):
+        with self._lock:
+            self.successes += 1
+            self._consecutive = 0
+            if not self.adaptive:
+                return
+            self.rate = min(self.max_rps, self.rate + self.increase)
+            self.highest = max(self.highest, self.rate)
+            if self.debug and self.successes % 10 == 0:
+                print(f"[debug] rate: {self.rate:.2f} rps (ok x{self.successes})")
+
+    def on_throttle(self, status: int, retry_after: Optional[float] = None):
+        with self._lock:
+            self.throttles += 1
+            self._consecutive += 1
+            if self.adaptive:
+                self.rate = max(self.min_rps, self.rate * self.decrease)
+                self.lowest = min(self.lowest, self.rate)
+            cooldown = retry_after if retry_after is not None else (2 ** self._consecutive) + random.uniform(0.0, 1.0)
+            cooldown = min(self.max_cooldown, cooldown)
+            self._blocked_until = max(self._blocked_until, time.monotonic() + cooldown)
+            self._tokens = 0.0
+            if self.debug:
+                ra = f" retry-after={retry_after:.1f}s" if retry_after is not None else ""
+                print(f"[debug] rate: HTTP {status}{ra} -> {self.rate:.2f} rps, cooldown {cooldown:.1f}s (throttle #{self.throttles})")
+
+    def feedback(self, status: int, retry_after: Optional[float] = None):
+        if status in (403, 429):
+            self.on_throttle(status, retry_after)
+        elif status < 400:
+            self.on_success()
+
+    def report(self) -> str:
+        return (f"rate: final={self.rate:.2f} rps range={self.lowest:.2f}..{self.highest:.2f} "
+                f"ok={self.successes} throttled={self.throttles}")
+
+# ---------- 差分取得の状態（--incremental） ----------
+class CrawlState:
+    """
+    ページごとの内容ハッシュ・ETag・Last-Modified と、304時に使うアイテムのキャッシュを保持する。
+    取得条件（limit / hot_only）が前回と違う場合は状態を捨てて全件取得扱いにする。
+    """
+    VERSION = 1
+
+    def __init__(self, path: str, limit: int, hot_only: bool):
+        self.path = path
+        self.signature = f"limit={limit}&hot_only={int(bool(hot_only))}"
+        self.pages: Dict[str, Dict[str, Any]] = {}
+        self.changed_pages: List[int] = []
+        self.last_page = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: str, limit: int, hot_only: bool, debug: bool=False) -> "CrawlState":
+        st = cls(path, limit, hot_only)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == cls.VERSION and data.get("signature") == st.signature:
+                st.pages = data.get("pages") or {}
+            elif debug:
+                print(f"[debug] state signature changed, ignore: {path}")
+        except FileNotFoundError:
             pass
+        except Exception as e:
+            print(f"[warn] state file unreadable, ignore: {path} ({e})")
+        if debug:
+            print(f"[debug] state loaded: pages={len(st.pages)} path={path}")
+        return st
+
+    @staticmethod
+    def _slim(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return [{k: it.get(k) for k in ITEM_KEYS if k in it} for it in items if isinstance(it, dict)]
+
+    @staticmethod
+    def content_hash(items: List[Dict[str, Any]]) -> str:
+        blob = json.dumps(CrawlState._slim(items), ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha1(blob.encode("utf-8")).hexdigest()
+
+    def request_headers(self, page: int) -> Dict[str, str]:
+        with self._lock:
+            ent = self.pages.get(str(page))
+        if not ent or not ent.get("items"):
+            return {}
+        h: Dict[str, str] = {}
+        if ent.get("etag"):
+            h["If-None-Match"] = ent["etag"]
+        if ent.get("last_modified"):
+            h["If-Modified-Since"] = ent["last_modified"]
+        return h
+
+    def record_validators(self, page: int, etag: Optional[str], last_modified: Optional[str]):
+        with self._lock:
+            ent = self.pages.setdefault(str(page), {})
+            ent["_etag_new"] = etag or ""
+            ent["_lm_new"] = last_modified or ""
+
+    def cached_items(self, page: int) -> List[Dict[str, Any]]:
+        with self._lock:
+            ent = self.pages.get(str(page)) or {}
+            return list(ent.get("items") or [])
+
+    def update_page(self, page: int, items: List[Dict[str, Any]], not_modified: bool=False) -> bool:
+        """ページの取得結果を反映し、前回から変わったかを返す"""
+        with self._lock:
+            ent = self.pages.setdefault(str(page), {})
+            etag_new = ent.pop("_etag_new", None)
+            lm_new = ent.pop("_lm_new", None)
+            if etag_new is not None:
+                ent["etag"] = etag_new
+            if lm_new is not None:
+                ent["last_modified"] = lm_new
+            if not_modified:
+                return False
+            h = self.content_hash(items)
+            changed = ent.get("hash") != h
+            ent["hash"] = h
+            ent["items"] = self._slim(items)
+            if changed:
+                self.changed_pages.append(page)
+            return changed
+
+    def finish(self, last_page: int):
+        """今回の最終ページより後ろの古い状態を捨てる（ページ数が減った場合も変更扱い）"""
+        self.last_page = last_page
+        stale = [k for k in self.pages if not k.isdigit() or int(k) > last_page]
+        for k in stale:
+            self.pages.pop(k, None)
+        if stale and last_page:
+            self.changed_pages.append(last_page + 1)
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.changed_pages) or self.last_page == 0
+
+    def save(self, path: Optional[str] = None):
+        path = path or self.path
+        _ensure_parent_dir(path)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": self.VERSION, "signature": self.signature, "pages": self.pages},
+                      f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, path)
+
+def commit_pending_state(state_path: str) -> bool:
+    """--pending-state で置いた <状態ファイル>.new を状態ファイルに昇格（無ければ False）"""
+    pending = state_path + PENDING_STATE_SUFFIX
+    if not os.path.exists(pending):
+        return False
+    os.replace(pending, state_path)
+    return True
+
+# ---------- 記録 / 再生（--record / --driver replay） ----------
+class PageRecorder:
+    """取得した生レスポンスを p{page}.body + p{page}.meta.json として保存する"""
+    def __init__(self, record_dir: str):
+        self.dir = record_dir
+        os.makedirs(record_dir, exist_ok=True)
+
+    def save(self, page: int, body: str, status: int, url: str, headers: Optional[Dict[str, str]] = None) -> bool:
+        """
+        2xx で本文があるときだけ保存（戻り値 True）。304（--incremental）や空の応答で
+        前回の記録を上書きすると replay で中身の無いページになるため。
+        """
+        if not (200 <= status < 300) or not (body or "").strip():
+            return False
+        base = os.path.join(self.dir, f"p{page}")
+        with open(base + ".body", "w", encoding="utf-8") as f:
+            f.write(body or "")
+        meta = {"page": page, "status": status, "url": url, "headers": dict(headers or {}),
+                "recorded_at": time.strftime("%Y-%m-%d %H:%M:%S")}
+        with open(base + ".meta.json", "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=1)
+        return True
+
+class ReplaySource:
+    """
+    PageRecorder で保存したページ（または p{page}.html）を fetcher と同じ形で返す。
+    - latency_ms: 1試行ごとの疑似レイテンシ（±20%）
+    - fail_403_rate: 1試行ごとに403を注入する確率（seed で再現可能）
+    """
+    def __init__(self, replay_dir: str, latency_ms: int = 0, fail_403_rate: float = 0.0, seed: int = 0):
+        if not os.path.isdir(replay_dir):
+            raise FileNotFoundError(f"replay dir not found: {replay_dir}")
+        self.dir = replay_dir
+        self.latency_ms = max(0, latency_ms)
+        self.fail_403_rate = max(0.0, min(1.0, fail_403_rate))
+        self._rnd = random.Random(seed)
+        self._lock = threading.Lock()
+        self.injected_403 = 0
+
+    def load(self, page: int) -> Optional[Tuple[str, int, str]]:
+        base = os.path.join(self.dir, f"p{page}")
+        meta: Dict[str, Any] = {}
+        if os.path.exists(base + ".meta.json"):
+            with open(base + ".meta.json", "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        for ext in (".body", ".html", ".json"):
+            if os.path.exists(base + ext):
+                with open(base + ext, "r", encoding="utf-8", errors="replace") as f:
+                    body = f.read()
+                return body, int(meta.get("status", 200)), str(meta.get("url", ""))
+        return None
+
+    def latency(self):
+        if self.latency_ms:
+            time.sleep(self.latency_ms * random.uniform(0.8, 1.2) / 1000.0)
+
+    def inject_403(self) -> bool:
+        if self.fail_403_rate <= 0:
+            return False
+        with self._lock:
+            hit = self._rnd.random() < self.fail_403_rate
+            if hit:
+                self.injected_403 += 1
+            return hit
+
+def fetch_page_replay(page: int, limit: int, hot_only: bool, timeout: float = 0.0, debug: bool=False,
+                      replay: Optional[ReplaySource] = None, limiter: Optional[AdaptiveRateLimiter] = None):
+    if replay is None:
+        raise RuntimeError("replay driver requires --replay-dir")
+    url = f"{BASE_URL}?{urlencode(build_params(page, limit, hot_only), doseq=True)}"
+    for attempt in range(1, 6):  # requests ドライバと同じ再試行回数
+        if limiter is not None:
+            limiter.acquire()
+        replay.latency()
+        if replay.inject_403():
+            if debug:
+                print(f"[debug] fetch_page(replay) try={attempt} page={page} status=403 (injected)")
+            if limiter is not None:
+                limiter.on_throttle(403)
+            else:
+                time.sleep(replay.latency_ms * (2 ** attempt) / 1000.0)
+            continue
+        rec = replay.load(page)
+        if rec is None:
+            if debug:
+                print(f"[debug] fetch_page(replay) page={page}: not recorded")
+            return [], url, 404
+        txt, status, used_url = rec
+        if debug:
+            print(f"[debug] fetch_page(replay) try={attempt} page={page} status={status} len={len(txt)}")
+        if limiter is not None:
+            limiter.feedback(status)
+        return parse_items_from_text(txt, debug=debug), used_url or url, status
+    if debug:
+        print("[debug] fetch_page(replay): all retries exhausted (treat as 403)")
+    return [], url, 403
+
+# ---------- 1ページ取得（requests + 再試行） ----------
+def fetch_page_requests(page: int, limit: int, hot_only: bool, timeout: float = 20.0, debug: bool=False,
+                        session_mgr: Optional[SessionManager] = None, crawl_state: Optional[CrawlState] = None,
+                        recorder: Optional[PageRecorder] = None, limiter: Optional[AdaptiveRateLimiter] = None):
+    own_mgr = session_mgr is None
+    if own_mgr:
+        session_mgr = SessionManager(pool_size=1, timeout=timeout, debug=debug)
+    try:
+        return _fetch_page_requests(session_mgr, page, limit, hot_only, timeout, debug, crawl_state, recorder, limiter)
+    finally:
+        if own_mgr:
+            session_mgr.close()
+
+def _fetch_page_requests(session_mgr: SessionManager, page: int, limit: int, hot_only: bool,
+                         timeout: float, debug: bool, crawl_state: Optional[CrawlState] = None,
+                         recorder: Optional[PageRecorder] = None, limiter: Optional[AdaptiveRateLimiter] = None):
+    cond_headers = crawl_state.request_headers(page) if crawl_state is not None else {}
+    for attempt in range(1, 6):  # 最大5回（limiter 無しなら指数バックオフ、有りなら limiter のクールダウン）
+        if limiter is not None:
+            limiter.acquire()
+        sess, gen = session_mgr.get()
+        ua = session_mgr.ua
 
         params = build_params(page, limit, hot_only)
         try:
-            r = sess.get(BASE_URL, params=params, timeout=timeout)
+            session_mgr.count_request()
+            r = sess.get(BASE_URL, params=params, timeout=timeout, headers=cond_headers or None)
         except requests.RequestException as e:
             if debug:
                 print(f"[debug] request error attempt={attempt}: {e}")
@@ -235,22 +798,27 @@ def fetch_page_requests(page: int, limit: int, hot_only: bool, timeout: float =
         if debug:
             print(f"[debug] fetch_page(req) try={attempt} ua={ua[:40]}... page={page} status={status} len={len(txt)} url={used_url}")
 
+        if status == 403:
+            session_mgr.rotate(gen)
+        if status in (403, 429) and limiter is not None:
+            limiter.on_throttle(status, parse_retry_after(r.headers.get("Retry-After")))
+            continue
         if status == 403:
             backoff = (2 ** attempt) + random.uniform(0.0, 1.0)
             time.sleep(backoff)
             continue
+        if limiter is not None:
+            limiter.feedback(status)
 
-        if txt.startswith("{") or txt.startswith("[" ):
-            try:
-                obj = r.json()
-                items = parse_items_from_json(obj)
-                if items:
-                    return items, used_url, status
-            except Exception as e:
-                if debug:
-                    print(f"[debug] json parse error: {e}")
+        if recorder is not None:
+            recorder.save(page, txt, status, used_url,
+                          {k: v for k, v in r.headers.items() if k.lower() in ("etag", "last-modified", "content-type")})
+        if crawl_state is not None:
+            crawl_state.record_validators(page, r.headers.get("ETag"), r.headers.get("Last-Modified"))
+        if status == 304:
+            return [], used_url, status
 
-        items = parse_items_from_next_data(txt)
+        items = parse_items_from_text(txt, debug=debug)
         return items, used_url, status
 
     if debug:
@@ -258,42 +826,111 @@ def fetch_page_requests(page: int, limit: int, hot_only: bool, timeout: float =
     return [], BASE_URL, 403
 
 # ---------- 1ページ取得（Playwright） ----------
-def fetch_page_playwright(page: int, limit: int, hot_only: bool, timeout: float = 25.0, debug: bool=False):
-    if sync_playwright is None:
-        raise RuntimeError("Playwright is not installed. Run: pip install playwright && python -m playwright install chromium")
-    params = build_params(page, limit, hot_only)
-    url = f"{BASE_URL}?{urlencode(params, doseq=True)}"
-    ua = random.choice(UAS)
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        context = browser.new_context(user_agent=ua, locale="ja-JP")
-        pageobj = context.new_page()
-        pageobj.set_default_timeout(int(timeout * 1000))
-
-        # まずトップでCookie
+class PlaywrightBrowser:
+    """
+    scrape_all 全体で1つの Chromium / context を使い回す。
+    - 専用スレッドで asyncio ループを回し、どのワーカースレッドからでも fetch() できる
+    - tabs 枚のタブをプールして並列に使う
+    - 画像・フォント・CSS はブロックし、__NEXT_DATA__ はレスポンス本文から直接読む
+    """
+    def __init__(self, tabs: int = 1, timeout: float = 25.0, debug: bool = False):
+        if async_playwright is None:
+            raise RuntimeError("Playwright is not installed. Run: pip install playwright && python -m playwright install chromium")
+        self.tabs = max(1, tabs)
+        self.timeout = timeout
+        self.debug = debug
+        self.ua = random.choice(UAS)
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
         try:
-            pageobj.goto(BASE_URL, wait_until="domcontentloaded")
+            self._run(self._start())
+        except Exception:
+            self._stop_loop()
+            raise
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    async def _start(self):
+        self._pw = await async_playwright().start()
+        self._browser = await self._pw.chromium.launch(headless=True)
+        self._context = await self._browser.new_context(user_agent=self.ua, locale="ja-JP")
+        self._context.set_default_timeout(int(self.timeout * 1000))
+        await self._context.route("**/*", self._route)
+        self._tabs: asyncio.Queue = asyncio.Queue()
+        for _ in range(self.tabs):
+            await self._tabs.put(await self._context.new_page())
+
+        # まずトップでCookie（1回だけ）
+        pageobj = await self._tabs.get()
+        try:
+            await pageobj.goto(BASE_URL, wait_until="domcontentloaded")
         except Exception:
             pass
+        finally:
+            self._tabs.put_nowait(pageobj)
+        if self.debug:
+            print(f"[debug] playwright: browser started tabs={self.tabs} ua={self.ua[:40]}...")
 
-        resp = pageobj.goto(url, wait_until="networkidle")
-        status = resp.status if resp else 200
-        if debug:
-            print(f"[debug] fetch_page(pw) status={status} url={url}")
+    @staticmethod
+    async def _route(route):
+        if route.request.resource_type in PW_BLOCK_RESOURCE_TYPES:
+            await route.abort()
+        else:
+            await route.continue_()
 
-        items: List[Dict[str, Any]] = []
+    async def _fetch(self, url: str) -> Tuple[str, int]:
+        pageobj = await self._tabs.get()
         try:
-            pageobj.wait_for_selector("script#__NEXT_DATA__", timeout=int(timeout * 1000))
-            txt = pageobj.locator("script#__NEXT_DATA__").inner_text()
-            data = json.loads(txt)
-            items = parse_items_from_json(data)
+            # networkidle を待たず、ナビゲーション応答の本文をそのまま使う
+            resp = await pageobj.goto(url, wait_until="commit")
+            if resp is None:
+                return await pageobj.content(), 200
+            return await resp.text(), resp.status
+        finally:
+            self._tabs.put_nowait(pageobj)
+
+    def fetch(self, url: str) -> Tuple[str, int]:
+        return self._run(self._fetch(url))
+
+    async def _close(self):
+        try:
+            await self._context.close()
+            await self._browser.close()
+        finally:
+            await self._pw.stop()
+
+    def _stop_loop(self):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+
+    def close(self):
+        try:
+            self._run(self._close())
         except Exception:
-            html = pageobj.content()
-            items = parse_items_from_next_data(html)
+            pass
         finally:
-            context.close()
+            self._stop_loop()
+
+def fetch_page_playwright(page: int, limit: int, hot_only: bool, timeout: float = 25.0, debug: bool=False,
+                          browser: Optional[PlaywrightBrowser] = None, recorder: Optional[PageRecorder] = None):
+    params = build_params(page, limit, hot_only)
+    url = f"{BASE_URL}?{urlencode(params, doseq=True)}"
+    own_browser = browser is None
+    if own_browser:
+        browser = PlaywrightBrowser(timeout=timeout, debug=debug)
+    try:
+        txt, status = browser.fetch(url)
+    finally:
+        if own_browser:
             browser.close()
-        return items, url, status
+    if debug:
+        print(f"[debug] fetch_page(pw) status={status} len={len(txt or '')} url={url}")
+    if recorder is not None:
+        recorder.save(page, txt, status, url)
+    items = parse_items_from_text(txt, debug=debug)
+    return items, url, status
 
 # ---------- レコード整形 ----------
 def items_to_rows(items: Iterable[Dict[str, Any]], used_url: str) -> List[List[Any]]:
@@ -313,48 +950,137 @@ def items_to_rows(items: Iterable[Dict[str, Any]], used_url: str) -> List[List[A
             rows.append([name, model, amount, category, rarity, used_url, name_norm])
     return rows
 
+# ---------- ページ取得（逐次 / 並列） ----------
+def _iter_pages_sequential(fetcher, limit: int, max_pages: int, hot_only: bool, debug: bool):
+    for page in range(1, max_pages + 1):
+        items, used_url, status = fetcher(page, limit, hot_only, debug=debug)
+        yield page, items, used_url, status
+
+def _iter_pages_concurrent(fetcher, limit: int, max_pages: int, hot_only: bool,
+                           concurrency: int, debug: bool):
+    """
+    最大 concurrency ページを先行取得し、結果は必ずページ順に返す。
+    呼び出し側が停止（break）した時点で未着手のページはキャンセルする。
+    リクエスト間隔は fetcher 側（共有 AdaptiveRateLimiter）が制御する。
+    """
+    def task(page: int):
+        return fetcher(page, limit, hot_only, debug=debug)
+
+    pool = ThreadPoolExecutor(max_workers=concurrency)
+    pending = {}
+    next_page = 1
+    try:
+        while next_page <= max_pages and len(pending) < concurrency:
+            pending[next_page] = pool.submit(task, next_page)
+            next_page += 1
+        for page in range(1, max_pages + 1):
+            fut = pending.pop(page)
+            if next_page <= max_pages:
+                pending[next_page] = pool.submit(task, next_page)
+                next_page += 1
+            items, used_url, status = fut.result()
+            yield page, items, used_url, status
+    finally:
+        for fut in pending.values():
+            fut.cancel()
+        # 実行中の取得は終わるまで待つ（この後 scrape_all が共有のブラウザ/セッションを閉じるため）
+        pool.shutdown(wait=True, cancel_futures=True)
+
 # ---------- 全ページ取得 ----------
 def scrape_all(limit=DEFAULT_LIMIT, max_pages=DEFAULT_MAX_PAGES, sleep_ms=DEFAULT_SLEEP_MS,
-               hot_only=False, debug: bool=False, driver: str="requests"):
+               hot_only=False, debug: bool=False, driver: str="requests",
+               concurrency: int=DEFAULT_CONCURRENCY, max_rps: float=DEFAULT_MAX_RPS,
+               crawl_state: Optional[CrawlState]=None, replay: Optional[ReplaySource]=None,
+               recorder: Optional[PageRecorder]=None, adaptive: bool=True):
+    t_start = time.perf_counter()
     all_rows: List[List[Any]] = []
     seen: Set[Tuple[str, str]] = set()
-    fetcher = fetch_page_playwright if driver == "playwright" else fetch_page_requests
+    session_mgr: Optional[SessionManager] = None
+    browser: Optional[PlaywrightBrowser] = None
+    pages = None
+    # 初期レートは --sleep-ms 相当、上限は --max-rps
+    initial_rps = (1000.0 / sleep_ms) if sleep_ms and sleep_ms > 0 else max_rps
+    limiter = AdaptiveRateLimiter(initial_rps, max_rps=max_rps, adaptive=adaptive, debug=debug)
+    if driver == "replay":
+        def fetcher(page, limit, hot_only, debug=False):
+            return fetch_page_replay(page, limit, hot_only, debug=debug, replay=replay, limiter=limiter)
+    elif driver == "playwright":
+        browser = PlaywrightBrowser(tabs=max(1, concurrency or 1), debug=debug)
+        def fetcher(page, limit, hot_only, debug=False):
+            limiter.acquire()
+            result = fetch_page_playwright(page, limit, hot_only, debug=debug, browser=browser, recorder=recorder)
+            limiter.feedback(result[2])
+            return result
+    else:
+        session_mgr = SessionManager(pool_size=max(1, concurrency or 1), debug=debug)
+        def fetcher(page, limit, hot_only, debug=False):
+            return fetch_page_requests(page, limit, hot_only, debug=debug, session_mgr=session_mgr,
+                                       crawl_state=crawl_state, recorder=recorder, limiter=limiter)
 
-    for page in range(1, max_pages + 1):
-        items, used_url, status = fetcher(page, limit, hot_only, debug=debug)
-        if status >= 400 and not items:
-            if debug:
-                print(f"[debug] stop: HTTP {status} with no items on page {page}")
-            break
-        if not items:
-            if debug:
-                print(f"[debug] stop: no items on page {page}")
-            break
+    # 途中で例外が出ても Chromium（専用スレッド）とセッションは必ず閉じる
+    try:
+        if concurrency and concurrency > 1:
+            pages = _iter_pages_concurrent(fetcher, limit, max_pages, hot_only, concurrency, debug)
+        else:
+            pages = _iter_pages_sequential(fetcher, limit, max_pages, hot_only, debug)
 
-        page_rows = items_to_rows(items, used_url)
+        last_page = 0
+        for page, items, used_url, status in pages:
+            not_modified = False
+            if status == 304 and crawl_state is not None:
+                items = crawl_state.cached_items(page)
+                not_modified = bool(items)
+            if status >= 400 and not items:
+                if debug:
+                    print(f"[debug] stop: HTTP {status} with no items on page {page}")
+                break
+            if not items:
+                if debug:
+                    print(f"[debug] stop: no items on page {page}")
+                break
 
-        # 重複排除（正規化名 + 型番）
-        deduped = []
-        for r in page_rows:
-            orig_name, model = str(r[0]).strip(), str(r[1]).strip()
-            key = (normalize_name_for_dedup(orig_name), model)
-            if key in seen:
-                continue
-            seen.add(key)
-            deduped.append(r)
+            last_page = page
+            if crawl_state is not None:
+                changed = crawl_state.update_page(page, items, not_modified=not_modified)
+                if debug:
+                    print(f"[debug] page {page}: {'not modified (304)' if not_modified else ('changed' if changed else 'unchanged')}")
 
-        all_rows.extend(deduped)
+            page_rows = items_to_rows(items, used_url)
 
-        if debug:
-            print(f"[debug] page {page}: items={len(items)} rows_kept={len(deduped)} cumulative={len(all_rows)}")
+            # 重複排除（正規化名 + 型番）
+            deduped = []
+            for r in page_rows:
+                orig_name, model = str(r[0]).strip(), str(r[1]).strip()
+                key = (normalize_name_for_dedup(orig_name), model)
+                if key in seen:
+                    continue
+                seen.add(key)
+                deduped.append(r)
+
+            all_rows.extend(deduped)
 
-        if len(items) < limit:
             if debug:
-                print(f"[debug] stop: items<{limit} (last page={page})")
-            break
+                print(f"[debug] page {page}: items={len(items)} rows_kept={len(deduped)} cumulative={len(all_rows)}")
 
-        jitter = random.uniform(0.8, 1.4)
-        time.sleep(max(0, sleep_ms) * jitter / 1000.0)
+            if len(items) < limit:
+                if debug:
+                    print(f"[debug] stop: items<{limit} (last page={page})")
+                break
+        if crawl_state is not None:
+            crawl_state.finish(last_page)
+    finally:
+        if pages is not None:
+            pages.close()
+        if browser is not None:
+            browser.close()
+        if session_mgr is not None:
+            session_mgr.close()
+    if session_mgr is not None:
+        print(f"[info] {session_mgr.report()}")
+    print(f"[info] {limiter.report()}")
+    if replay is not None and replay.injected_403:
+        print(f"[info] replay: injected 403 x{replay.injected_403}")
+    print(f"[info] crawl: driver={driver} pages={last_page} rows={len(all_rows)} elapsed={time.perf_counter() - t_start:.2f}s")
     return all_rows
 
 # ---------- Excelユーティリティ ----------
@@ -406,11 +1132,40 @@ def _open_or_create_workbook(file_path: str, debug: bool=False):
         return wb, new_path
 
 # ---------- Excel書き込み ----------
-def write_to_excel(rows: List[List[Any]], file_path: str, sheet_name: str, debug: bool=False) -> Tuple[str, int]:
-    if not rows:
-        print("[warn] fetched 0 rows. keep previous data (no overwrite).")
-        return unicodedata.normalize("NFC", file_path), 0
+def _write_sheet_streaming(rows: List[List[Any]], file_path: str, sheet_name: str, debug: bool=False) -> bool:
+    """
+    xlsm(zip) 内の対象シートXMLだけを書き直す。他のパーツ（シート1・VBA・スタイル等）は圧縮バイトのままコピー。
+    対象シートが無い・zipでない等で使えない場合は False（呼び出し側で openpyxl 経路へ）。
+    """
+    if not os.path.exists(file_path) or not zipfile.is_zipfile(file_path):
+        return False
+    with zipfile.ZipFile(file_path) as zf:
+        part = xlsm_zip.find_sheet_part(zf, sheet_name)
+    if part is None:
+        return False
+    if debug:
+        print(f"[debug] stream-write sheet part: {part}")
+
+    def writer(zin: zipfile.ZipFile, out):
+        prefix, suffix = xlsm_zip.split_sheet_xml(zin, part)
+        ref = f"A1:{xlsm_zip.col_letter(len(SHEET_HEADER))}{len(rows) + 1}"
+        out.write(xlsm_zip.set_dimension(prefix, ref))
+        out.write(b"<sheetData>")
+        buf: List[str] = []
+        for row_xml in xlsm_zip.iter_rows_xml(chain([SHEET_HEADER], rows)):
+            buf.append(row_xml)
+            if len(buf) >= 1000:
+                out.write("".join(buf).encode("utf-8"))
+                buf.clear()
+        if buf:
+            out.write("".join(buf).encode("utf-8"))
+        out.write(b"</sheetData>")
+        out.write(suffix)
+
+    xlsm_zip.rewrite_members(file_path, {part: writer})
+    return True
 
+def _write_sheet_openpyxl(rows: List[List[Any]], file_path: str, sheet_name: str, debug: bool=False) -> str:
     wb, actual_path = _open_or_create_workbook(file_path, debug=debug)
 
     if sheet_name in wb.sheetnames:
@@ -423,12 +1178,28 @@ def write_to_excel(rows: List[List[Any]], file_path: str, sheet_name: str, debug
             print(f"[debug] create new sheet: {sheet_name} / existing={wb.sheetnames}")
         ws = wb.create_sheet(sheet_name)
 
-    header = ["カード名", "型番", "買取金額(円)", "カテゴリ", "レア", "取得元URL", "比較用カード名"]
-    ws.append(header)
+    ws.append(SHEET_HEADER)
     for r in rows:
         ws.append(r)
 
     wb.save(actual_path)
+    return actual_path
+
+def write_to_excel(rows: List[List[Any]], file_path: str, sheet_name: str, debug: bool=False,
+                   writer: str=DEFAULT_WRITER) -> Tuple[str, int]:
+    if not rows:
+        print("[warn] fetched 0 rows. keep previous data (no overwrite).")
+        return unicodedata.normalize("NFC", file_path), 0
+
+    t0 = time.perf_counter()
+    actual_path = unicodedata.normalize("NFC", file_path)
+    streamed = False
+    if writer == "stream":
+        streamed = _write_sheet_streaming(rows, actual_path, sheet_name, debug=debug)
+        if not streamed and debug:
+            print("[debug] stream writer not applicable, fallback to openpyxl")
+    if not streamed:
+        actual_path = _write_sheet_openpyxl(rows, actual_path, sheet_name, debug=debug)
 
     try:
         st = os.stat(actual_path)
@@ -436,8 +1207,9 @@ def write_to_excel(rows: List[List[Any]], file_path: str, sheet_name: str, debug
     except Exception:
         pass
 
-    updated_cells = len(rows) * len(header)
-    print(f"[info] rows_written={len(rows)} updated_cells~={updated_cells}")
+    updated_cells = len(rows) * len(SHEET_HEADER)
+    print(f"[info] rows_written={len(rows)} updated_cells~={updated_cells} "
+          f"writer={'stream' if streamed else 'openpyxl'} elapsed={time.perf_counter() - t0:.2f}s")
     return actual_path, len(rows)
 
 # ---------- CLI ----------
@@ -449,35 +1221,107 @@ def main():
     ap.add_argument("--sheet-name", default="シート2", help="出力先シート名")
     ap.add_argument("--limit", type=int, default=DEFAULT_LIMIT)
     ap.add_argument("--max-pages", type=int, default=DEFAULT_MAX_PAGES)
-    ap.add_argument("--sleep-ms", type=int, default=DEFAULT_SLEEP_MS)
+    ap.add_argument("--sleep-ms", type=int, default=DEFAULT_SLEEP_MS,
+                    help="初期リクエスト間隔（ミリ秒）。以降は応答に応じて自動調整")
+    ap.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                    help="並列取得ページ数（1=従来どおり逐次取得）")
+    ap.add_argument("--max-rps", type=float, default=DEFAULT_MAX_RPS,
+                    help="全体リクエスト上限（件/秒）。2xxが続くとここまで加速する")
+    ap.add_argument("--fixed-rate", action="store_true",
+                    help="レート自動調整を無効化（--sleep-ms の間隔で固定）")
     ap.add_argument("--hot-only", action="store_true")
     ap.add_argument("--min-rows", type=int, default=0, help="最小許容件数（未満なら終了コード2で落とす）")
-    ap.add_argument("--driver", choices=["requests", "playwright"], default="requests",
-                    help="取得方式（requests / playwright）")
+    ap.add_argument("--driver", choices=["requests", "playwright", "replay"], default="requests",
+                    help="取得方式（requests / playwright / replay=記録済みページを再生）")
+    ap.add_argument("--record", default=None, metavar="DIR",
+                    help="取得した生レスポンスをDIRへ保存（requests / playwright）")
+    ap.add_argument("--replay-dir", default=None, metavar="DIR", help="--driver replay の再生元")
+    ap.add_argument("--replay-latency-ms", type=int, default=0, help="再生時の疑似レイテンシ（ミリ秒/試行）")
+    ap.add_argument("--replay-403-rate", type=float, default=0.0, help="再生時に403を注入する確率（0～1/試行）")
+    ap.add_argument("--replay-seed", type=int, default=0, help="403注入の乱数シード")
+    ap.add_argument("--writer", choices=["stream", "openpyxl"], default=DEFAULT_WRITER,
+                    help="Excel書き込み方式（stream=シートXMLのみ差し替え / openpyxl=ブック全体を保存）")
+    ap.add_argument("--snapshot-db", default=None, metavar="PATH",
+                    help="取得結果をタイムスタンプ付きスナップショットとしてSQLiteへ追記（値段更新.py --s2-snapshot で読込可）")
+    ap.add_argument("--incremental", action="store_true",
+                    help=f"前回から無変更ならExcelを書き換えず終了コード{EXIT_UNCHANGED}で終了")
+    ap.add_argument("--state-file", default=None,
+                    help=f"--incremental の状態ファイル（既定: Excelと同じフォルダの {DEFAULT_STATE_FILE}）")
+    ap.add_argument("--pending-state", action="store_true",
+                    help=f"変更ありのときの状態は <状態ファイル>{PENDING_STATE_SUFFIX} に保存（後続が成功したら --commit-state で確定）")
+    ap.add_argument("--commit-state", action="store_true",
+                    help=f"取得はせず、<状態ファイル>{PENDING_STATE_SUFFIX} を状態ファイルに確定して終了")
     ap.add_argument("--debug", action="store_true")
     args = ap.parse_args()
 
     if args.debug:
         print(f"[debug] start with args: {vars(args)}")
 
+    replay: Optional[ReplaySource] = None
+    recorder: Optional[PageRecorder] = None
+    if args.driver == "replay":
+        if not args.replay_dir:
+            ap.error("--driver replay には --replay-dir が必要です")
+        replay = ReplaySource(args.replay_dir, latency_ms=args.replay_latency_ms,
+                              fail_403_rate=args.replay_403_rate, seed=args.replay_seed)
+    if args.record:
+        if args.driver == "replay":
+            ap.error("--record は requests / playwright ドライバでのみ使えます")
+        recorder = PageRecorder(args.record)
+
+    state_path = args.state_file or os.path.join(os.path.dirname(os.path.abspath(args.file_path)), DEFAULT_STATE_FILE)
+    if args.commit_state:
+        if commit_pending_state(state_path):
+            print(f"[OK] 差分取得の状態を確定: {state_path}")
+        else:
+            print(f"[info] 確定する状態がありません: {state_path}{PENDING_STATE_SUFFIX}")
+        return
+
+    crawl_state: Optional[CrawlState] = None
+    if args.incremental:
+        crawl_state = CrawlState.load(state_path, args.limit, args.hot_only, debug=args.debug)
+        if args.pending_state and os.path.exists(state_path + PENDING_STATE_SUFFIX):
+            # 前回の未確定分（後続が失敗した回）は使わない。比較は常に確定済みの状態と
+            os.remove(state_path + PENDING_STATE_SUFFIX)
+
     rows = scrape_all(
         limit=args.limit,
         max_pages=args.max_pages,
         sleep_ms=args.sleep_ms,
         hot_only=args.hot_only,
         debug=args.debug,
-        driver=args.driver
+        driver=args.driver,
+        concurrency=args.concurrency,
+        max_rps=args.max_rps,
+        adaptive=not args.fixed_rate,
+        crawl_state=crawl_state,
+        replay=replay,
+        recorder=recorder,
     )
 
     if len(rows) == 0:
         print("[err] scraped 0 rows (blocked or parse failed).")
-        raise SystemExit(2)
+        raise SystemExit(EXIT_FAILED)
 
     if args.min_rows and len(rows) < args.min_rows:
         print(f"[err] too few rows: {len(rows)} (<{args.min_rows}).")
-        raise SystemExit(2)
+        raise SystemExit(EXIT_FAILED)
+
+    if crawl_state is not None and not crawl_state.changed:
+        # 確定済みの状態と中身が同じ = 後続でやり直すものは無いので、ETag 等はそのまま確定してよい
+        crawl_state.save()
+        print(f"[OK] 変更なし（{crawl_state.last_page} ページ / {len(rows)} 件）: Excel書き込みをスキップ")
+        raise SystemExit(EXIT_UNCHANGED)
 
-    path, n = write_to_excel(rows, args.file_path, args.sheet_name, debug=args.debug)
+    path, n = write_to_excel(rows, args.file_path, args.sheet_name, debug=args.debug, writer=args.writer)
+    if args.snapshot_db:
+        sid = cardrush_snapshot.write_snapshot(args.snapshot_db, rows, source=args.driver)
+        print(f"[info] snapshot #{sid} saved: {os.path.abspath(args.snapshot_db)} rows={len(rows)}")
+    if crawl_state is not None:
+        # 書き込み成功後にだけ状態を保存（失敗時は次回も変更ありとして扱う）。
+        # --pending-state なら .new に置くだけで、確定は後続が全部成功してから（--commit-state）
+        crawl_state.save(state_path + PENDING_STATE_SUFFIX if args.pending_state else None)
+        print(f"[info] changed pages: {sorted(set(crawl_state.changed_pages))}")
     print(f"[OK] {n} 件を書き込み完了: {args.sheet_name} → {path}")
 
 if __name__ == "__main__":
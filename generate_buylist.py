@@ -8,15 +8,33 @@ r"""
 - 見出し「デュエマ買取表」1.2倍 / ロゴとアクション群は中央寄せ
 - 画像ON/OFFどちらの状態でも必ず描画されるrender()に刷新
 - ページャ中央 / カート・ビューア開閉時のスクロールロック＋フォーカス管理（jump防止）
+
+生成は load → normalize → payload → render → write の段ごとの関数で、main() から順に呼ぶ。
+import しただけではファイルを読まない（ロゴ/アイコンも render 時に1回だけ読む）。
+
+  import generate_buylist as gb
+  df_raw, src = gb.load("buylist.xlsm")
+  df = gb.normalize(df_raw)
+  ver, cards_json = gb.build_payload(df)
+  outputs = gb.render(ver, cards_json, gb.updated_label(src))   # {相対パス: 中身}
+  gb.write(Path("docs"), outputs)
+
+CSS/JS/ロゴ/アイコンは既定（ASSET_MODE=hashed）で docs/static/ に内容ハッシュ付きの名前で出し、
+3ページはそれを参照するだけ（各ページ約7KB）。ASSET_MODE=inline で従来どおり各ページに埋め込む。
+docs/build_manifest.json と入力のハッシュが同じなら "up to date" で何もしない（--force で作り直し）。
 """
 
-from typing import Optional, List, Tuple
+from typing import Dict, Optional, List, NamedTuple, Tuple, Union
+from contextlib import contextmanager
+from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
 from urllib.parse import urlparse, parse_qs
+import numpy as np
 import pandas as pd
 import html as html_mod
 import unicodedata as ud
-import base64, mimetypes, os, sys, hashlib, io, json, re, glob
+import argparse, base64, mimetypes, os, sys, hashlib, io, json, re, glob, time, zipfile
 
 try:
     import requests
@@ -25,6 +43,11 @@ except Exception:
     requests = None
     Image = None
 
+try:
+    import xlsm_zip
+except Exception:
+    xlsm_zip = None
+
 # ====== 入力パス ======
 DEFAULT_EXCEL = str(Path(__file__).resolve().parent / "buylist.xlsm")
 ALT_EXCEL     = DEFAULT_EXCEL
@@ -32,8 +55,6 @@ FALLBACK_WINDOWS = DEFAULT_EXCEL
 
 EXCEL_PATH = os.getenv("EXCEL_PATH", DEFAULT_EXCEL)
 SHEET_NAME = os.getenv("SHEET_NAME", "シート1")
-if len(sys.argv) > 1 and sys.argv[1]:
-    EXCEL_PATH = sys.argv[1]
 
 # ====== 出力・設定 ======
 OUT_DIR    = Path(os.getenv("OUT_DIR", "docs"))
@@ -48,6 +69,11 @@ LIFF_ID = os.getenv("LIFF_ID", "2007983559-MKopknXd")
 OA_ID   = os.getenv("OA_ID",   "@512nwjvn")
 TAKUHAI_URL = os.getenv("TAKUHAI_URL", "https://climaxcard.github.io/climax2/#buy")
 
+# CSS/JS/ロゴ/アイコン: hashed = OUT_DIR/static/ に内容ハッシュ付きファイルで出して各ページから参照 / inline = 各ページに埋め込み
+ASSET_MODE = os.getenv("ASSET_MODE", "hashed").strip().lower()
+STATIC_DIR_NAME = "static"
+LOGO_MAX_H = int(os.getenv("LOGO_MAX_H", "180"))  # ロゴの表示高さ 60px × 3（高DPI用）
+
 # ロゴ/アイコン（環境変数でパス指定可）
 LOGO_FILE_ENV      = os.getenv("LOGO_FILE", "").strip()
 X_ICON_FILE_ENV    = os.getenv("X_ICON_FILE", "").strip()
@@ -72,6 +98,26 @@ IDX_PROMO = 15  # P列（チェック/フラグ）
 THUMB_DIR = OUT_DIR / "assets" / "thumbs"
 THUMB_W = 600
 
+# normalize で使う列: 列名 → (見出し候補, 見出しが無いときの列位置)
+COLUMN_SPECS: Dict[str, Tuple[List[str], Optional[int]]] = {
+    "name":    (["display_name","商品名"],                    IDX_NAME),
+    "pack":    (["expansion","エキスパンション"],              IDX_PACK),
+    "code":    (["cardnumber","カード番号"],                   IDX_CODE),
+    "rarity":  (["rarity","レアリティ"],                       IDX_RARITY),
+    "booster": (["pack_name","封入パック","パック名"],          IDX_BOOST),
+    "price":   (["buy_price","買取価格"],                     IDX_PRICE),
+    "image":   (["allow_auto_print_label","画像URL"],          IDX_IMGURL),
+    "supply":  (["supply","サプライ","商品カテゴリ","category"], IDX_SUPPLY),
+    "promo":   (["promo","強化","チェック","check","flag"],     IDX_PROMO),
+}
+
+# Excel の読み方: auto（必要な列だけXMLから直接読む）/ calamine（python-calamine が必要）/ openpyxl（従来どおり全列）
+EXCEL_ENGINE = os.getenv("EXCEL_ENGINE", "auto").strip().lower()
+# 読み込み結果のキャッシュ（シートの中身が変わっていなければ Excel を読み直さない）。空なら無効
+INGEST_CACHE_DIR = os.getenv("INGEST_CACHE_DIR", str(BASE_DIR / ".cache" / "ingest")).strip()
+HEADER_SCAN_ROWS = 12   # _normalize_two_header_layout が見出し行を探す範囲
+_INGEST_VERSION = 1
+
 # ====== 共有ユーティリティ ======
 def _cand_paths(names):
     for d in FIXED_DIRS + [Path.cwd()/ "assets"]:
@@ -102,13 +148,29 @@ def file_to_data_uri(p: Optional[Path]) -> str:
     except Exception:
         return ""
 
-LOGO_URI = file_to_data_uri(find_logo_path())
-X_ICON_URI    = file_to_data_uri(find_icon_path(X_ICON_FILE_ENV,    ["X.png","x.png","x-logo.png","assets/X.png"]))
-LINE_ICON_URI = file_to_data_uri(find_icon_path(LINE_ICON_FILE_ENV, ["LINE.png","line.png","line-icon.png","assets/LINE.png"]))
-INSTAGRAM_ICON_URI = file_to_data_uri(find_icon_path(IG_ICON_FILE_ENV, ["IG.png","Instagram.png","instagram.png","insta.png","assets/instagram.png","assets/IG.png"]))
-TIKTOK_ICON_URI = file_to_data_uri(
-    find_icon_path(TIKTOK_ICON_FILE_ENV, ["tiktok.png", "TikTok.png", "assets/tiktok.png", "assets/TikTok.png"])
-)
+def icon_paths() -> Dict[str, Optional[Path]]:
+    """ロゴ/SNSアイコンのファイル（見つからなければ None）"""
+    return {
+        "logo": find_logo_path(),
+        "x": find_icon_path(X_ICON_FILE_ENV, ["X.png","x.png","x-logo.png","assets/X.png"]),
+        "line": find_icon_path(LINE_ICON_FILE_ENV, ["LINE.png","line.png","line-icon.png","assets/LINE.png"]),
+        "instagram": find_icon_path(IG_ICON_FILE_ENV, ["IG.png","Instagram.png","instagram.png","insta.png","assets/instagram.png","assets/IG.png"]),
+        "tiktok": find_icon_path(TIKTOK_ICON_FILE_ENV, ["tiktok.png", "TikTok.png", "assets/tiktok.png", "assets/TikTok.png"]),
+    }
+
+@lru_cache(maxsize=None)
+def load_icons() -> Dict[str, str]:
+    """ロゴ/SNSアイコンの data URI（見つからなければ ""）。初回呼び出し時に1回だけ読む。"""
+    return {k: file_to_data_uri(p) for k, p in icon_paths().items()}
+
+@contextmanager
+def timed(times: Dict[str, float], name: str):
+    """with timed(times, "load"): ... → times["load"] に所要秒"""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        times[name] = time.perf_counter() - t0
 
 # ====== 入力 ======
 def _read_csv_auto(path: Path) -> pd.DataFrame:
@@ -143,31 +205,169 @@ def _resolve_input(pref: Optional[str]) -> Path:
     if files: return files[0]
     raise FileNotFoundError("CSV/Excel が見つかりません。")
 
-def load_buylist_any(path_hint: str, sheet_name: Optional[str]) -> pd.DataFrame:
-    p=_resolve_input(path_hint)
-    if p.suffix.lower()==".csv":
-        df0=_read_csv_auto(p); return _normalize_two_header_layout(df0)
+def _read_excel_pandas(p: Path, sheet_name: Optional[str], engine: str) -> pd.DataFrame:
     try:
         if sheet_name:
-            df0=pd.read_excel(p, sheet_name=sheet_name, header=None, engine="openpyxl")
-        else:
-            xls=pd.ExcelFile(p, engine="openpyxl")
-            df0=pd.read_excel(xls, sheet_name=xls.sheet_names[0], header=None, engine="openpyxl")
+            return pd.read_excel(p, sheet_name=sheet_name, header=None, engine=engine)
     except Exception:
-        xls=pd.ExcelFile(p, engine="openpyxl")
-        df0=pd.read_excel(xls, sheet_name=xls.sheet_names[0], header=None, engine="openpyxl")
-    return _normalize_two_header_layout(df0)
+        pass
+    with pd.ExcelFile(p, engine=engine) as xls:
+        return pd.read_excel(xls, sheet_name=xls.sheet_names[0], header=None, engine=engine)
+
+def _sheet_part(zf: zipfile.ZipFile, sheet_name: Optional[str]) -> str:
+    part = xlsm_zip.find_sheet_part(zf, sheet_name) if sheet_name else None
+    return part or xlsm_zip.find_sheet_part(zf, xlsm_zip.sheet_names(zf)[0])
+
+def _needed_columns(head_rows: List[Dict[int, object]]) -> set:
+    """normalize が使う列（1始まり）: 列位置フォールバック + 見出し行で名前が一致した列"""
+    cols = {idx + 1 for _names, idx in COLUMN_SPECS.values() if idx is not None}
+    wanted = {nm for names, _idx in COLUMN_SPECS.values() for nm in names}
+    for row in head_rows:
+        labels = {str(v) for v in row.values()}
+        if "display_name" in labels and "cardnumber" in labels:
+            cols |= {c for c, v in row.items() if str(v) in wanted}
+            break
+    return cols
+
+_CELL_ERROR = object()
+
+def _pandas_cell(v):
+    """openpyxl のセル値 → pd.read_excel と同じ値（空は ""、整数値の float は int、エラーは NaN）"""
+    if v is None: return ""
+    if v is _CELL_ERROR: return float("nan")
+    if isinstance(v, float):
+        iv = int(v)
+        return iv if iv == v else v
+    return v
+
+def _read_excel_stream(p: Path, sheet_name: Optional[str]) -> Tuple[pd.DataFrame, int]:
+    """
+    シートXMLを直接走査して、normalize が使う列だけ値にする（他の列は空のまま）。
+    先頭 HEADER_SCAN_ROWS 行は見出し判定のため全列読む。戻り値は (df, 読んだ列数)。
+    normalize が使う列は pd.read_excel(header=None, engine="openpyxl") と同じ値・同じ型推論になる
+    （使わない列にしか値のない末尾の行は落ちるが、name が空の行は normalize で除かれるので結果は同じ）。
+    """
+    from pandas.io.parsers import TextParser
+
+    with zipfile.ZipFile(p) as zf:
+        part = _sheet_part(zf, sheet_name)
+        head: List[Dict[int, object]] = []
+        cols: List[set] = []
+
+        def cols_for_row(r: int) -> Optional[set]:
+            if r <= HEADER_SCAN_ROWS: return None
+            if not cols: cols.append(_needed_columns(head))
+            return cols[0]
+
+        data: List[list] = []
+        for r, cells in xlsm_zip.iter_sheet_values(zf, part, cols_for_row, xlsm_zip.read_shared_strings(zf),
+                                                   xlsm_zip.date_style_ids(zf), _CELL_ERROR):
+            if r <= HEADER_SCAN_ROWS: head.append(cells)
+            if r <= len(data): raise ValueError(f"row {r} out of order")
+            data.extend([] for _ in range(r - 1 - len(data)))
+            row = [""] * (max(cells) if cells else 0)
+            for c, v in cells.items(): row[c - 1] = _pandas_cell(v)
+            while row and row[-1] == "": row.pop()
+            data.append(row)
+    while data and not data[-1]: data.pop()
+    if not data:
+        return pd.DataFrame(), 0
+    width = max(len(row) for row in data)
+    data = [row + [""] * (width - len(row)) for row in data]
+    n_cols = len(cols[0]) if cols else width
+    return TextParser(data, header=None, skip_blank_lines=False).read(), n_cols
+
+def _sheet_signature(p: Path, sheet_name: Optional[str]) -> Optional[list]:
+    """対象シート・共有文字列・スタイル・ブック定義の (zip内パス, CRC, サイズ)。ほかのシートだけの変更では変わらない"""
+    if xlsm_zip is None: return None
+    try:
+        with zipfile.ZipFile(p) as zf:
+            names = {_sheet_part(zf, sheet_name), "xl/workbook.xml", "xl/sharedStrings.xml", "xl/styles.xml"}
+            return [[i.filename, i.CRC, i.file_size] for i in zf.infolist() if i.filename in names]
+    except (zipfile.BadZipFile, KeyError, IndexError, OSError):
+        return None
 
-df_raw = load_buylist_any(EXCEL_PATH, SHEET_NAME)
-from datetime import datetime
+def _ingest_cache_path(p: Path, sheet_name: Optional[str]) -> Optional[Path]:
+    """キャッシュのファイル名 = _sheet_signature のハッシュ"""
+    if not INGEST_CACHE_DIR: return None
+    sig = _sheet_signature(p, sheet_name)
+    if sig is None: return None
+    h = hashlib.sha1(json.dumps([_INGEST_VERSION, sheet_name, EXCEL_ENGINE, sig]).encode("utf-8")).hexdigest()[:16]
+    return Path(INGEST_CACHE_DIR) / f"{p.stem}-{h}.pkl"
 
-try:
-    # 実際に使われる入力ファイルのパスを解決して更新時刻を取得
-    INPUT_FILE = _resolve_input(EXCEL_PATH)
-    UPDATED_AT = datetime.fromtimestamp(INPUT_FILE.stat().st_mtime).strftime("%Y/%m/%d %H:%M")
-    UPDATED_LABEL = f"最終更新：{UPDATED_AT}"
-except Exception:
-    UPDATED_LABEL = ""
+# 直近の読み込みの情報（main が表示する）: engine / seconds / cache / columns
+LAST_INGEST: Dict[str, object] = {}
+
+def load_buylist_any(path_hint: str, sheet_name: Optional[str]) -> pd.DataFrame:
+    p=_resolve_input(path_hint)
+    t0=time.perf_counter()
+    LAST_INGEST.clear()
+    if p.suffix.lower()==".csv":
+        df0=_read_csv_auto(p)
+        LAST_INGEST.update(engine="csv", cache="off", seconds=time.perf_counter()-t0)
+        return _normalize_two_header_layout(df0)
+
+    cache_path=_ingest_cache_path(p, sheet_name)
+    if cache_path is not None and cache_path.exists():
+        try:
+            df=pd.read_pickle(cache_path)
+            LAST_INGEST.update(engine="cache", cache="hit", seconds=time.perf_counter()-t0)
+            return df
+        except Exception:
+            pass
+
+    engine=EXCEL_ENGINE
+    if engine=="auto": engine="stream" if xlsm_zip is not None else "openpyxl"
+    df0=None; n_cols=None
+    if engine=="stream":
+        try:
+            df0, n_cols=_read_excel_stream(p, sheet_name)
+        except (ValueError, KeyError, IndexError, zipfile.BadZipFile) as e:
+            print(f"[ingest] 直接読みできないため openpyxl で読み直します: {e}")
+            engine="openpyxl"
+    elif engine=="calamine":
+        try:
+            df0=_read_excel_pandas(p, sheet_name, "calamine")
+        except ImportError:
+            print("[ingest] python-calamine が無いため openpyxl で読みます")
+            engine="openpyxl"
+    if df0 is None:
+        df0=_read_excel_pandas(p, sheet_name, "openpyxl")
+    df=_normalize_two_header_layout(df0)
+
+    LAST_INGEST.update(engine=engine, cache="miss" if cache_path is not None else "off",
+                       seconds=time.perf_counter()-t0, columns=n_cols if n_cols is not None else df0.shape[1])
+    if cache_path is not None:
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            for old in cache_path.parent.glob(f"{p.stem}-*.pkl"): old.unlink()
+            df.to_pickle(cache_path)
+        except OSError:
+            pass
+    return df
+
+_LOAD_CACHE: Dict[tuple, pd.DataFrame] = {}
+
+def load(path_hint: Optional[str] = None, sheet_name: Optional[str] = SHEET_NAME) -> Tuple[pd.DataFrame, Path]:
+    """
+    [load] 入力（CSV/Excel）を読む → (df_raw, 実際に読んだパス)。
+    同じプロセス内では、ファイルの更新時刻・サイズが変わっていなければ前回の結果を返す。
+    """
+    p = _resolve_input(path_hint or EXCEL_PATH)
+    st = p.stat()
+    key = (str(p.resolve()), st.st_mtime_ns, st.st_size, sheet_name)
+    if key not in _LOAD_CACHE:
+        _LOAD_CACHE.clear()
+        _LOAD_CACHE[key] = load_buylist_any(str(p), sheet_name)
+    return _LOAD_CACHE[key], p
+
+def updated_label(input_path: Path) -> str:
+    """入力ファイルの更新時刻 → 「最終更新：YYYY/MM/DD HH:MM」"""
+    try:
+        updated_at = datetime.fromtimestamp(input_path.stat().st_mtime).strftime("%Y/%m/%d %H:%M")
+        return f"最終更新：{updated_at}"
+    except Exception:
+        return ""
 
 # ====== テキスト整形 ======
 SEP_RE = re.compile(r"[\s\u30FB\u00B7·/／\-_—–−]+")
@@ -185,6 +385,7 @@ def to_int_series(s: pd.Series) -> pd.Series:
     return pd.to_numeric(s, errors="coerce").round().astype("Int64")
 
 def to_bool_series(s: pd.Series) -> pd.Series:
+    """値ごとの判定は異なる値の数だけ（☐/☑ など数種類）行い、結果を行に配る"""
     TRUE_SET  = {"true","1","yes","y","on","☑","✓","✔","◯","○","レ","済"}
     FALSE_SET = {"false","0","no","n","off","","none","nan","null"}
 
@@ -214,7 +415,11 @@ def to_bool_series(s: pd.Series) -> pd.Series:
         # それ以外は安全側で False
         return False
 
-    return s.map(_one)
+    if len(s) == 0:
+        return s.map(_one)
+    # True/1/1.0 のように == で等しい値は同じ判定になるので、factorize でまとめてよい
+    codes, uniques = pd.factorize(s, use_na_sentinel=False)
+    return pd.Series(np.array([_one(v) for v in uniques], dtype=bool)[codes], index=s.index)
 
 def to_supply_series(s: pd.Series) -> pd.Series:
     return s.astype(str).fillna("").str.strip().str.lower().eq("サプライ")
@@ -243,29 +448,63 @@ def detail_to_img(val: str) -> str:
     if slug: return f"https://dm.takaratomy.co.jp/wp-content/card/cardimage/{slug}.jpg"
     return ""
 
+# 検索用の読み替え（NFKC・小文字化した後に適用）▼ ここを拡張
+SEARCH_ALIASES = {
+    "complex": "こんぷれっくす",
+    "c0br4":   "こぶら",
+    "伝説":    "でんせつ",
+    "真気楼":  "ぺてんしー",
+    "墓碑":    "えぴたふ",
+    "西方":    "びすまるく",
+}
+ALIAS_RE = re.compile("|".join(map(re.escape, SEARCH_ALIASES)))
+KATA_TO_HIRA = str.maketrans({chr(c): chr(c - 0x60) for c in range(ord("ァ"), ord("ン") + 1)})
+SEARCH_COLS = ("name","code","pack","rarity","booster")
+
+def _alias_sub(m: re.Match) -> str: return SEARCH_ALIASES[m.group(0)]
+
 def nfkc_lower(s:str)->str: return ud.normalize("NFKC", s or "").lower()
-def kata_to_hira(text:str)->str: return "".join(chr(ord(ch)-0x60) if "ァ"<=ch<="ン" else ch for ch in text)
+def kata_to_hira(text:str)->str: return text.translate(KATA_TO_HIRA)
 
 def normalize_for_search_py(s:str)->str:
     s0 = nfkc_lower(s)
-    # ▼ ここを拡張
-    s0 = (s0
-          .replace("complex","こんぷれっくす")
-          .replace("c0br4","こぶら")
-          .replace("伝説","でんせつ")
-          .replace("真気楼","ぺてんしー")
-          .replace("墓碑","えぴたふ")
-          .replace("西方","びすまるく")
-    )
+    s0 = ALIAS_RE.sub(_alias_sub, s0)
     s0 = kata_to_hira(s0)
     s0 = SEP_RE.sub("", s0)
     return s0
 
 
 def searchable_row_py(row: pd.Series) -> str:
-    parts=[row.get(k,"") for k in ("name","code","pack","rarity","booster")]
+    parts=[row.get(k,"") for k in SEARCH_COLS]
     return normalize_for_search_py(" ".join(map(str, parts)))
 
+# 入力値 → 正規化済み文字列（弾・レアリティ・封入パックは数千行で同じ値が繰り返されるため）
+_SEARCH_NORM_CACHE: Dict[str, str] = {}
+
+def normalize_for_search_series(s: pd.Series) -> pd.Series:
+    """normalize_for_search_py の列版。未変換の異なる値だけ pandas の文字列処理でまとめて変換する"""
+    s = s.astype(str)
+    cache = _SEARCH_NORM_CACHE
+    todo = pd.Series([v for v in pd.unique(s) if v not in cache], dtype=object)
+    if len(todo):
+        done = (todo.str.normalize("NFKC").str.lower()
+                    .str.replace(ALIAS_RE, _alias_sub, regex=True)
+                    .str.translate(KATA_TO_HIRA)
+                    .str.replace(SEP_RE, "", regex=True))
+        cache.update(zip(todo, done))
+    return s.map(cache)
+
+def searchable_series(df: pd.DataFrame) -> pd.Series:
+    """
+    searchable_row_py の列版: 列ごとに正規化して連結する。
+    列の間の " " は最後に区切りとして消え、NFKC の合成も空白をまたがないので、行ごとに連結してから正規化した結果と同じ。
+    """
+    out = pd.Series([""] * len(df), index=df.index, dtype=object)
+    for k in SEARCH_COLS:
+        if k in df.columns:
+            out = out + normalize_for_search_series(df[k])
+    return out
+
 def get_col(df: pd.DataFrame, names: List[str], fallback_idx: Optional[int]):
     for nm in names:
         if nm in df.columns: return df[nm]
@@ -273,38 +512,12 @@ def get_col(df: pd.DataFrame, names: List[str], fallback_idx: Optional[int]):
         return df.iloc[:, fallback_idx]
     return pd.Series([""]*len(df), index=df.index)
 
-S_NAME   = get_col(df_raw, ["display_name","商品名"],            IDX_NAME)
-S_PACK   = get_col(df_raw, ["expansion","エキスパンション"],      IDX_PACK)
-S_CODE   = get_col(df_raw, ["cardnumber","カード番号"],           IDX_CODE)
-S_RARITY = get_col(df_raw, ["rarity","レアリティ"],               IDX_RARITY)
-S_BOOST  = get_col(df_raw, ["pack_name","封入パック","パック名"],  IDX_BOOST)
-S_PRICE  = get_col(df_raw, ["buy_price","買取価格"],             IDX_PRICE)
-S_IMGURL = get_col(df_raw, ["allow_auto_print_label","画像URL"],  IDX_IMGURL)
-S_SUPPLY = get_col(df_raw, ["supply","サプライ","商品カテゴリ","category"], IDX_SUPPLY)
-S_PROMO  = get_col(df_raw, ["promo","強化","チェック","check","flag"], IDX_PROMO)
-
-df = pd.DataFrame({
-    "promo":   to_bool_series(S_PROMO),
-    "supply":  to_supply_series(S_SUPPLY),
-    "supply":  to_supply_series(S_SUPPLY),
-    "name":    clean_text(S_NAME),
-    "pack":    clean_text(S_PACK),
-    "code":    clean_text(S_CODE),
-    "rarity":  clean_text(S_RARITY),
-    "booster": clean_text(S_BOOST),
-    "price":   to_int_series(S_PRICE) if len(S_PRICE) else pd.Series([None]*len(df_raw)),
-    "image":   clean_text(S_IMGURL).map(detail_to_img),
-})
-df = df[~df["name"].str.match(r"^Unnamed", na=False)]
-df = df[df["name"].str.strip()!=""].reset_index(drop=True)
-df["s"] = df.apply(searchable_row_py, axis=1)
-
 # ====== サムネ生成（任意） ======
 def url_to_hash(u:str)->str: return hashlib.md5(u.encode("utf-8")).hexdigest()
-def ensure_thumb(url: str) -> Optional[str]:
+def ensure_thumb(url: str, thumb_dir: Path = THUMB_DIR) -> Optional[str]:
     if not url: return None
-    THUMB_DIR.mkdir(parents=True, exist_ok=True)
-    fname = url_to_hash(url) + ".webp"; outp = THUMB_DIR / fname
+    thumb_dir.mkdir(parents=True, exist_ok=True)
+    fname = url_to_hash(url) + ".webp"; outp = thumb_dir / fname
     if outp.exists(): return f"assets/thumbs/{fname}"
     if not (requests and Image): return None
     try:
@@ -320,11 +533,41 @@ def ensure_thumb(url: str) -> Optional[str]:
     except Exception:
         return None
 
-if BUILD_THUMBS: df["thumb"] = df["image"].map(ensure_thumb)
-else:            df["thumb"] = ""
+# ====== 正規化 ======
+def normalize(df_raw: pd.DataFrame, build_thumbs: bool = BUILD_THUMBS, thumb_dir: Path = THUMB_DIR) -> pd.DataFrame:
+    """[normalize] 生の表 → 1カード1行（name/pack/code/rarity/booster/price/image/thumb/s/promo/supply）"""
+    S_NAME   = get_col(df_raw, *COLUMN_SPECS["name"])
+    S_PACK   = get_col(df_raw, *COLUMN_SPECS["pack"])
+    S_CODE   = get_col(df_raw, *COLUMN_SPECS["code"])
+    S_RARITY = get_col(df_raw, *COLUMN_SPECS["rarity"])
+    S_BOOST  = get_col(df_raw, *COLUMN_SPECS["booster"])
+    S_PRICE  = get_col(df_raw, *COLUMN_SPECS["price"])
+    S_IMGURL = get_col(df_raw, *COLUMN_SPECS["image"])
+    S_SUPPLY = get_col(df_raw, *COLUMN_SPECS["supply"])
+    S_PROMO  = get_col(df_raw, *COLUMN_SPECS["promo"])
+
+    df = pd.DataFrame({
+        "promo":   to_bool_series(S_PROMO),
+        "supply":  to_supply_series(S_SUPPLY),
+        "name":    clean_text(S_NAME),
+        "pack":    clean_text(S_PACK),
+        "code":    clean_text(S_CODE),
+        "rarity":  clean_text(S_RARITY),
+        "booster": clean_text(S_BOOST),
+        "price":   to_int_series(S_PRICE) if len(S_PRICE) else pd.Series([None]*len(df_raw)),
+        "image":   clean_text(S_IMGURL).map(detail_to_img),
+    })
+    df = df[~df["name"].str.match(r"^Unnamed", na=False)]
+    df = df[df["name"].str.strip()!=""].reset_index(drop=True)
+    df["s"] = searchable_series(df)
+
+    if build_thumbs: df["thumb"] = df["image"].map(lambda u: ensure_thumb(u, thumb_dir))
+    else:            df["thumb"] = ""
+    return df
 
 # ====== ペイロード ======
 def build_payload(df: pd.DataFrame) -> Tuple[str, str]:
+    """[payload] カード表 → (版数, カード配列のJSON文字列)"""
     # 欠損カラムの補完（priceはNone, promoはFalse, 他は空文字）
     for c in ["name","pack","code","rarity","booster","price","image","thumb","s","promo","supply"]:
         if c not in df.columns:
@@ -379,19 +622,13 @@ def build_payload(df: pd.DataFrame) -> Tuple[str, str]:
     ver = hashlib.md5(payload.encode("utf-8")).hexdigest()[:8]
     return ver, payload
 
-
-CARDS_VER, CARDS_JSON = build_payload(df)
-
-def write_api_json(out_dir: Path):
+def api_json_text(cards_ver: str, cards_json: str, updated_text: str) -> str:
     payload_obj = {
-        "version": CARDS_VER,
-        "updated_label": UPDATED_LABEL,
-        "items": json.loads(CARDS_JSON),
+        "version": cards_ver,
+        "updated_label": updated_text,
+        "items": json.loads(cards_json),
     }
-    (out_dir / API_JSON_NAME).write_text(
-        json.dumps(payload_obj, ensure_ascii=False, separators=(",", ":")),
-        encoding="utf-8"
-    )
+    return json.dumps(payload_obj, ensure_ascii=False, separators=(",", ":"))
 
 # ====== CSS ======
 base_css = """
@@ -2151,15 +2388,25 @@ document.addEventListener('dblclick', (e)=>{
 """
 
 # ===== HTML =====
-def html_page(title: str, js_source: str, logo_uri: str, buylist_api_url: str, updated_text: str = "") -> str:
+def html_page(title: str, js_source: str, logo_uri: str, buylist_api_url: str, updated_text: str = "",
+              cards_ver: str = "", icons: Optional[Dict[str, str]] = None,
+              css_href: str = "", js_src: str = "", initial_sort: str = "") -> str:
+    """
+    1ページ分の HTML。css_href/js_src を渡すと CSS/JS は外部ファイル参照（js_source/base_css は埋め込まない）、
+    initial_sort はそのとき共有 JS に渡す初期ソート（JS リテラル）。
+    """
+    icons = load_icons() if icons is None else icons
     shop_svg   = "<svg viewBox='0 0 24 24' aria-hidden='true' fill='currentColor'><path d='M3 9.5V8l2.2-3.6c.3-.5.6-.7 1-.7h11.6c.4 0 .7.2 .9 .6L21 8v1.5c0 1-.8 1.8-1.8 1.8-.9 0-1.6-.6-1.8-1.4-.2 .8-.9 1.4-1.8 1.4s-1.6-.6-1.8-1.4c-.2 .8-.9 1.4-1.8 1.4C3.8 11.3 3 10.5 3 9.5zM5 12.5h14V20c0 .6-.4 1-1 1H6c-.6 0-1-.4-1-1v-7.5zm4 1.5v5h6v-5H9zM6.3 5.2 5 7.5h14l-1.3-2.3H6.3z'/></svg>"
     login_svg  = "<svg viewBox='0 0 24 24' aria-hidden='true' fill='currentColor'><path d='M12 12a5 5 0 1 0-5-5 5 5 0 0 0 5 5zm0 2c-4.418 0-8 2.239-8 5v2h16v-2c0-2.761-3.582-5-8-5z'/></svg>"
     takuhai_svg= "<svg viewBox='0 0 24 24' aria-hidden='true' fill='currentColor'><path d='M3 6h11a2 2 0 0 1 2 2v1h3l2 3v5a2 2 0 0 1-2 2h-1a2 2 0 0 1-2-2H8a2 2 0 0 1-2 2H4a2 2 0 0 1-2-2V8a2 2 0 0 1 2-2Zm0 2v9h2a2 2 0 0 1 2-2h8V8H3Zm16 3h-2v4h4v-3.2L19 11Z'/></svg>"
     parts=[]
     parts.append("<!doctype html><html lang='ja'><head><meta charset='utf-8'>")
     parts.append("<meta name='viewport' content='width=device-width,initial-scale=1'>")
-    parts.append(f"<meta name='cards-ver' content='{CARDS_VER}'>")
-    parts.append("<style>"); parts.append(base_css); parts.append("</style>")
+    parts.append(f"<meta name='cards-ver' content='{cards_ver}'>")
+    if css_href:
+        parts.append(f"<link rel='stylesheet' href='{css_href}'>")
+    else:
+        parts.append("<style>"); parts.append(base_css); parts.append("</style>")
     parts.append("<script src='https://static.line-scdn.net/liff/edge/2/sdk.js' data-liff></script>")
     parts.append("</head><body>")
 
@@ -2187,29 +2434,29 @@ def html_page(title: str, js_source: str, logo_uri: str, buylist_api_url: str, u
     # Loginボタン（削除）
 
     # Xアイコン
-    if X_ICON_URI:
-        parts.append(f"<a class='iconimg iconimg--x' href='https://x.com/climaxcard' target='_blank' rel='noopener'><img src='{X_ICON_URI}' alt='X'></a>")
+    if icons["x"]:
+        parts.append(f"<a class='iconimg iconimg--x' href='https://x.com/climaxcard' target='_blank' rel='noopener'><img src='{icons['x']}' alt='X'></a>")
 
     # LINEアイコン
-    if LINE_ICON_URI:
-        parts.append(f"<a class='iconimg iconimg--line' href='https://line.me/R/ti/p/{OA_ID}' target='_blank' rel='noopener'><img src='{LINE_ICON_URI}' alt='LINE'></a>")
+    if icons["line"]:
+        parts.append(f"<a class='iconimg iconimg--line' href='https://line.me/R/ti/p/{OA_ID}' target='_blank' rel='noopener'><img src='{icons['line']}' alt='LINE'></a>")
 
     # Instagramアイコン
-    if INSTAGRAM_ICON_URI:
+    if icons["instagram"]:
         parts.append(
             "<a class='iconimg iconimg--ig' "
             "href='https://www.instagram.com/cardshopclimax?igsh=d3VybGZraHlhZXUy&utm_source=qr' "
             "target='_blank' rel='noopener'>"
-            f"<img src='{INSTAGRAM_ICON_URI}' alt='Instagram'></a>"
+            f"<img src='{icons['instagram']}' alt='Instagram'></a>"
         )
 
     # ★ TikTokアイコン追加
-    if TIKTOK_ICON_URI:
+    if icons["tiktok"]:
         parts.append(
             "<a class='iconimg iconimg--tiktok' "
             "href='https://www.tiktok.com/@climax.card?_r=1&_t=ZS-92xBq1BJbro' "
             "target='_blank' rel='noopener'>"
-            f"<img src='{TIKTOK_ICON_URI}' alt='TikTok'></a>"
+            f"<img src='{icons['tiktok']}' alt='TikTok'></a>"
         )
 
     # カートボタン
@@ -2273,7 +2520,9 @@ def html_page(title: str, js_source: str, logo_uri: str, buylist_api_url: str, u
     parts.append("<script>")
     parts.append("window.__BUYLIST_API__=" + json.dumps(buylist_api_url, ensure_ascii=False) + ";")
     parts.append("window.__UPDATED_LABEL__=" + json.dumps(updated_text or "", ensure_ascii=False) + ";")
-    parts.append("window.__APP_VERSION__=" + json.dumps(CARDS_VER, ensure_ascii=False) + ";")
+    parts.append("window.__APP_VERSION__=" + json.dumps(cards_ver, ensure_ascii=False) + ";")
+    if initial_sort:
+        parts.append(f"window.__INITIAL_SORT__={initial_sort};")
     parts.append("</script>")
 
     # cart modal  ← 関数内にインデント
@@ -2297,38 +2546,259 @@ def html_page(title: str, js_source: str, logo_uri: str, buylist_api_url: str, u
 )
 
     # scripts
-    parts.append("<script>")
-    parts.append(js_source)
-    parts.append("</script>")
+    if js_src:
+        parts.append(f"<script src='{js_src}'></script>")
+    else:
+        parts.append("<script>")
+        parts.append(js_source)
+        parts.append("</script>")
     parts.append("</body></html>")
     return "".join(parts)
 
 
 # ===== 出力 =====
-OUT_DIR.mkdir(parents=True, exist_ok=True)
-write_api_json(OUT_DIR)
-
-def write_mode(dir_name: str, initial_sort_js_literal: str, title_text: str):
-    sub = OUT_DIR / dir_name
-    sub.mkdir(parents=True, exist_ok=True)
-    js = (base_js
-          .replace("__PER_PAGE__", str(PER_PAGE))
-          .replace("__INITIAL_SORT__", initial_sort_js_literal)
-          .replace("__LIFF_ID__", LIFF_ID)
-          .replace("__OA_ID__", OA_ID))
-    html = html_page(title_text, js, LOGO_URI, BUYLIST_API_URL, UPDATED_LABEL)
-    (sub/"index.html").write_text(html, encoding="utf-8")
-
-write_mode("default", "'desc'", "デュエマ買取表")
-write_mode("price_desc", "'desc'", "デュエマ買取表（price_desc）")
-write_mode("price_asc",  "'asc'",  "デュエマ買取表（price_asc）")
-
-(OUT_DIR/"index.html").write_text("<meta http-equiv='refresh' content='0; url=default/'>", encoding="utf-8")
-
-print(f"[*] Excel/CSV: {EXCEL_PATH!r}")
-print(f"[*] PER_PAGE={PER_PAGE}  BUILD_THUMBS={'1' if BUILD_THUMBS else '0'}")
-print(f"[LOGO] {'embedded' if LOGO_URI else 'not found (fallback text used)'}")
-print(f"[X ICON] {'embedded' if X_ICON_URI else 'not found'}")
-print(f"[LINE ICON] {'embedded' if LINE_ICON_URI else 'not found'}")
-print(f"[OK] 生成完了 → {OUT_DIR.resolve()} / 総件数{len(df)}")
+# (ディレクトリ, 初期ソート, タイトル)
+MODES = [
+    ("default",    "'desc'", "デュエマ買取表"),
+    ("price_desc", "'desc'", "デュエマ買取表（price_desc）"),
+    ("price_asc",  "'asc'",  "デュエマ買取表（price_asc）"),
+]
 
+def page_js(initial_sort_js_literal: str) -> str:
+    return (base_js
+            .replace("__PER_PAGE__", str(PER_PAGE))
+            .replace("__INITIAL_SORT__", initial_sort_js_literal)
+            .replace("__LIFF_ID__", LIFF_ID)
+            .replace("__OA_ID__", OA_ID))
+
+def _hashed_name(stem: str, data: bytes, ext: str) -> str:
+    return f"{stem}.{_sha256(data)[:10]}{ext}"
+
+@lru_cache(maxsize=None)
+def _image_asset(path: Path, max_h: int = 0) -> Tuple[bytes, str]:
+    """画像ファイル → (中身, 拡張子)。max_h 指定時は Pillow があれば高さ max_h 以下の WebP に縮小（失敗したら元のまま）"""
+    data = path.read_bytes()
+    if max_h and Image is not None and path.suffix.lower() != ".svg":
+        try:
+            im = Image.open(io.BytesIO(data))
+            im = im.convert("RGBA" if "A" in im.getbands() or "transparency" in im.info else "RGB")
+            im.thumbnail((max(1, im.width * max_h // max(1, im.height)), max_h), Image.LANCZOS, reducing_gap=3.0)
+            buf = io.BytesIO()
+            im.save(buf, "WEBP", quality=90)  # method=6 は数秒かかって数百バイトしか縮まない
+            if buf.tell() < len(data):
+                return buf.getvalue(), ".webp"
+        except Exception:
+            pass
+    return data, path.suffix.lower()
+
+# 内容ハッシュ付きファイルは中身が変わるとファイル名も変わるので、ずっとキャッシュしてよい
+# （_headers は Netlify / Cloudflare Pages 形式。GitHub Pages では使われず max-age=600 になる）
+STATIC_HEADERS = f"""/{STATIC_DIR_NAME}/*
+  Cache-Control: public, max-age=31536000, immutable
+"""
+
+def static_assets() -> Tuple[Dict[str, Union[str, bytes]], Dict[str, str]]:
+    """
+    ASSET_MODE=hashed 用: 3ページ共通の CSS/JS とロゴ/アイコンを static/<名前>.<ハッシュ>.<拡張子> にする。
+    戻り値は ({OUT_DIR からの相対パス: 中身}, {種類: ページからの URL})。
+    JS の初期ソートだけはページごとに違うので window.__INITIAL_SORT__ で受ける。
+    """
+    files: Dict[str, Union[str, bytes]] = {"_headers": STATIC_HEADERS}
+    urls: Dict[str, str] = {}
+
+    def add(kind: str, stem: str, data: bytes, ext: str, content: Union[str, bytes]):
+        rel = f"{STATIC_DIR_NAME}/{_hashed_name(stem, data, ext)}"
+        files[rel] = content
+        urls[kind] = "../" + rel
+
+    js = page_js("(window.__INITIAL_SORT__||'desc')")
+    add("css", "app", _output_bytes(base_css), ".css", base_css)
+    add("js", "app", _output_bytes(js), ".js", js)
+    for kind, path in icon_paths().items():
+        if not path:
+            urls[kind] = ""
+            continue
+        try:
+            data, ext = _image_asset(path, LOGO_MAX_H if kind == "logo" else 0)
+        except OSError:
+            urls[kind] = ""
+            continue
+        add(kind, kind, data, ext, data)
+    return files, urls
+
+def render(cards_ver: str, cards_json: str, updated_text: str, icons: Optional[Dict[str, str]] = None) -> Dict[str, Union[str, bytes]]:
+    """[render] 出力ファイルの中身を {OUT_DIR からの相対パス: 文字列/バイト列} で返す（書き込みはしない）"""
+    outputs: Dict[str, Union[str, bytes]] = {API_JSON_NAME: api_json_text(cards_ver, cards_json, updated_text)}
+    if ASSET_MODE == "inline":
+        icons = load_icons() if icons is None else icons
+        for dir_name, initial_sort_js_literal, title_text in MODES:
+            outputs[f"{dir_name}/index.html"] = html_page(title_text, page_js(initial_sort_js_literal), icons["logo"],
+                                                          BUYLIST_API_URL, updated_text, cards_ver=cards_ver, icons=icons)
+    else:
+        files, urls = static_assets()
+        outputs.update(files)
+        for dir_name, initial_sort_js_literal, title_text in MODES:
+            outputs[f"{dir_name}/index.html"] = html_page(title_text, "", urls["logo"], BUYLIST_API_URL, updated_text,
+                                                          cards_ver=cards_ver, icons=urls, css_href=urls["css"],
+                                                          js_src=urls["js"], initial_sort=initial_sort_js_literal)
+    outputs["index.html"] = "<meta http-equiv='refresh' content='0; url=default/'>"
+    return outputs
+
+def _output_bytes(text: str) -> bytes:
+    # write_text(encoding="utf-8") と同じバイト列（Windows では改行が CRLF）
+    return (text if os.linesep == "\n" else text.replace("\n", os.linesep)).encode("utf-8")
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+def _content_bytes(content: Union[str, bytes]) -> bytes:
+    return content if isinstance(content, bytes) else _output_bytes(content)
+
+def write(out_dir: Path, outputs: Dict[str, Union[str, bytes]]) -> List[Path]:
+    """[write] render の結果を out_dir に書き出す。中身が同じファイルは書かない（更新時刻も変えない）"""
+    written = []
+    for rel, content in outputs.items():
+        path = out_dir / rel
+        data = _content_bytes(content)
+        try:
+            if path.stat().st_size == len(data) and path.read_bytes() == data:
+                continue
+        except OSError:
+            pass
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+        written.append(path)
+    return written
+
+# ===== ビルドマニフェスト（入力とアセットのハッシュ → 変化がなければ何もしない）=====
+MANIFEST_NAME = os.getenv("MANIFEST_NAME", "build_manifest.json")
+_MANIFEST_VERSION = 1
+
+def build_inputs(input_path: Path, sheet_name: Optional[str]) -> Dict[str, object]:
+    """
+    出力を決める入力のハッシュ（Excel/CSV の中身・生成スクリプト・設定・CSS/JS・ロゴ/アイコン）。
+    Excel は読むシート側の部品（_sheet_signature）だけを見る → 値段更新のシート2だけの書き換えでは作り直さない。
+    """
+    code = [Path(__file__)] + ([Path(xlsm_zip.__file__)] if xlsm_zip is not None else [])
+    config = [sheet_name, PER_PAGE, BUILD_THUMBS, API_JSON_NAME, BUYLIST_API_URL, LIFF_ID, OA_ID, TAKUHAI_URL,
+              ASSET_MODE, LOGO_MAX_H]
+    assets: Dict[str, Optional[str]] = {
+        "css": _sha256(base_css.encode("utf-8")),
+        "js": _sha256(base_js.encode("utf-8")),
+    }
+    for k, p in icon_paths().items():
+        assets[k] = _sha256(p.read_bytes()) if p else None
+    return {
+        "input": _input_signature(input_path, sheet_name),
+        "generator": _sha256(b"".join(p.read_bytes() for p in code)),
+        "config": _sha256(json.dumps(config, ensure_ascii=False).encode("utf-8")),
+        "assets": assets,
+    }
+
+def _input_signature(input_path: Path, sheet_name: Optional[str]) -> Dict[str, object]:
+    sig = _sheet_signature(input_path, sheet_name) if input_path.suffix.lower() != ".csv" else None
+    if sig is not None:
+        return {"name": input_path.name, "sheet": sheet_name, "parts": sig}
+    return {"name": input_path.name, "sha256": _sha256(input_path.read_bytes())}
+
+def read_manifest(out_dir: Path) -> Dict[str, object]:
+    try:
+        m = json.loads((out_dir / MANIFEST_NAME).read_text(encoding="utf-8"))
+        return m if m.get("version") == _MANIFEST_VERSION else {}
+    except (OSError, ValueError):
+        return {}
+
+def outputs_intact(out_dir: Path, manifest: Dict[str, object]) -> bool:
+    """マニフェストに記録した出力がすべて残っていて、中身も記録どおりか"""
+    outputs = manifest.get("outputs") or {}
+    for rel, digest in outputs.items():
+        try:
+            if _sha256((out_dir / rel).read_bytes()) != digest:
+                return False
+        except OSError:
+            return False
+    return bool(outputs)
+
+class BuildResult(NamedTuple):
+    input_path: Path
+    rows: int
+    cards_ver: str
+    written: List[Path]
+    times: Dict[str, float]  # 段ごとの所要秒
+    up_to_date: bool = False
+    removed: Tuple[Path, ...] = ()  # 前回の出力のうち今回は作らなかった static/ のファイル（削除済み）
+
+def build(excel_path: Optional[str] = None, sheet_name: Optional[str] = SHEET_NAME, out_dir: Path = OUT_DIR,
+          build_thumbs: bool = BUILD_THUMBS, force: bool = False) -> BuildResult:
+    """
+    load → normalize → payload → render → write を順に実行。
+    入力・アセットのハッシュが前回のマニフェストと同じで出力も手つかずなら、読み込みから省略する（force で無効）。
+    """
+    times: Dict[str, float] = {}
+    with timed(times, "check"):
+        input_path = _resolve_input(excel_path or EXCEL_PATH)
+        inputs = build_inputs(input_path, sheet_name)
+        manifest = read_manifest(out_dir)
+        fresh = (not force and not build_thumbs
+                 and all(manifest.get(k) == v for k, v in inputs.items()) and outputs_intact(out_dir, manifest))
+    if fresh:
+        payload = manifest.get("payload") or {}
+        return BuildResult(input_path, int(payload.get("rows") or 0), str(payload.get("version") or ""), [], times, True)
+
+    with timed(times, "load"):
+        df_raw, input_path = load(str(input_path), sheet_name)
+    with timed(times, "normalize"):
+        df = normalize(df_raw, build_thumbs=build_thumbs, thumb_dir=out_dir / "assets" / "thumbs")
+    with timed(times, "payload"):
+        cards_ver, cards_json = build_payload(df)
+    with timed(times, "render"):
+        outputs = render(cards_ver, cards_json, updated_label(input_path))
+    with timed(times, "write"):
+        written = write(out_dir, outputs)
+        new_manifest = dict(inputs)
+        new_manifest.update({
+            "version": _MANIFEST_VERSION,
+            "payload": {"version": cards_ver, "sha256": _sha256(cards_json.encode("utf-8")), "rows": len(df)},
+            "outputs": {rel: _sha256(_content_bytes(content)) for rel, content in outputs.items()},
+        })
+        written += write(out_dir, {MANIFEST_NAME: json.dumps(new_manifest, ensure_ascii=False, indent=1) + "\n"})
+        # 古いハッシュ名の CSS/JS/画像を片付ける（マニフェストに載っているものだけ。手で置いたファイルは消さない）
+        removed = []
+        for rel in (manifest.get("outputs") or {}):
+            if rel.startswith(STATIC_DIR_NAME + "/") and rel not in outputs and (out_dir / rel).is_file():
+                (out_dir / rel).unlink()
+                removed.append(out_dir / rel)
+    return BuildResult(input_path, len(df), cards_ver, written, times, removed=tuple(removed))
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="デュエマ買取表 静的ページ生成")
+    ap.add_argument("excel", nargs="?", default=None, help=f"入力 CSV/Excel（省略時: 環境変数 EXCEL_PATH → {DEFAULT_EXCEL}）")
+    ap.add_argument("--force", action="store_true", help="入力が前回と同じでも全部作り直す")
+    args = ap.parse_args(argv)
+    excel_path = args.excel or EXCEL_PATH
+
+    res = build(excel_path, SHEET_NAME, OUT_DIR, BUILD_THUMBS, force=args.force)
+    if res.up_to_date:
+        print(f"[OK] up to date（{res.input_path.name} は前回の生成から変化なし / 版 {res.cards_ver} / "
+              f"{res.times['check']:.2f}s）→ {OUT_DIR.resolve()}")
+        return 0
+    icons = icon_paths()
+    how = "embedded" if ASSET_MODE == "inline" else f"{STATIC_DIR_NAME}/"
+    print(f"[*] Excel/CSV: {excel_path!r}")
+    print(f"[*] PER_PAGE={PER_PAGE}  BUILD_THUMBS={'1' if BUILD_THUMBS else '0'}  ASSET_MODE={ASSET_MODE}")
+    print(f"[LOGO] {how if icons['logo'] else 'not found (fallback text used)'}")
+    print(f"[X ICON] {how if icons['x'] else 'not found'}")
+    print(f"[LINE ICON] {how if icons['line'] else 'not found'}")
+    if LAST_INGEST:
+        cols = f" / {LAST_INGEST['columns']}列" if LAST_INGEST.get("columns") else ""
+        print(f"[ingest] {LAST_INGEST['engine']} {LAST_INGEST['seconds']:.2f}s (cache {LAST_INGEST['cache']}{cols})")
+    print("[time] " + " / ".join(f"{k} {v:.2f}s" for k, v in res.times.items()))
+    print(f"[write] 書き換え {len(res.written)} ファイル: " + (", ".join(str(p.relative_to(OUT_DIR)) for p in res.written) or "なし"))
+    if res.removed:
+        print(f"[write] 削除 {len(res.removed)} ファイル: " + ", ".join(str(p.relative_to(OUT_DIR)) for p in res.removed))
+    print(f"[OK] 生成完了 → {OUT_DIR.resolve()} / 総件数{res.rows}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,107 @@
+﻿# -*- coding: utf-8 -*-
+r"""
+値段更新.py のマッチ結果キャッシュ（SQLite・標準ライブラリのみ）
+
+- キー: シート1の1行から作る正規化キー（正規化名 / raw名 / 虹フラグ / 秘種別 / EF・F の STRICT・LOOSE 型番キー）
+- 値  : そのキーで参照するシート2候補リストのダイジェスト（deps）+ マッチ段・候補リスト内の位置・スコア
+        + 選ばれたシート2行の (正規化名, STRICT型番キー)
+- deps が一致すれば（金額やほかの行が変わっていても）マッチ結果は同じなので、再マッチせずに使う
+- meta 表の fingerprint（マッチャーのソース・しきい値）が今回と違えば全件捨てて作り直す
+"""
+
+import os
+import sqlite3
+import time
+from typing import Dict, Optional, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS matches(
+  key      TEXT    PRIMARY KEY,
+  deps     TEXT    NOT NULL,
+  pass     TEXT    NOT NULL,
+  pos      INTEGER NOT NULL,
+  score    REAL    NOT NULL,
+  s2_name  TEXT    NOT NULL,
+  s2_model TEXT    NOT NULL,
+  used_at  TEXT    NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta(
+  k TEXT PRIMARY KEY,
+  v TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+# (deps, pass, pos, score, s2_name, s2_model)。マッチなしは pass="" / pos=-1
+CacheEntry = Tuple[str, str, int, float, str, str]
+
+
+class MatchCache:
+    def __init__(self, path: str, fingerprint: str = ""):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.entries: Dict[str, CacheEntry] = {}
+        self.dirty: Dict[str, CacheEntry] = {}
+        self.hits = 0
+        self.misses = 0
+        self.cleared = False  # 保存時に既存の行を全部消して fingerprint を書く
+        self.rebuilt = False  # 既存のキャッシュをマッチャー変更で捨てた
+        if os.path.exists(path):
+            con = sqlite3.connect(path)
+            try:
+                con.executescript(SCHEMA)
+                row = con.execute("SELECT v FROM meta WHERE k='fingerprint'").fetchone()
+                if (row[0] if row else None) != fingerprint:
+                    self.cleared = self.rebuilt = True
+                else:
+                    for key, deps, pass_name, pos, score, s2_name, s2_model in con.execute(
+                            "SELECT key, deps, pass, pos, score, s2_name, s2_model FROM matches"):
+                        self.entries[key] = (deps, pass_name, pos, score, s2_name, s2_model)
+            finally:
+                con.close()
+        else:
+            self.cleared = True
+
+    def get(self, key: str, deps: str) -> Optional[CacheEntry]:
+        """deps まで一致したときだけ返す"""
+        e = self.entries.get(key)
+        if e is not None and e[0] == deps:
+            return e
+        return None
+
+    def count(self, hit: bool):
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    def put(self, key: str, entry: CacheEntry):
+        self.entries[key] = entry
+        self.dirty[key] = entry
+
+    def save(self):
+        if not self.dirty and not self.cleared:
+            return
+        parent = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(parent, exist_ok=True)
+        now = time.strftime("%Y-%m-%d %H:%M:%S")
+        con = sqlite3.connect(self.path)
+        try:
+            con.executescript(SCHEMA)
+            with con:
+                if self.cleared:
+                    con.execute("DELETE FROM matches")
+                    con.execute("INSERT OR REPLACE INTO meta(k, v) VALUES ('fingerprint', ?)", (self.fingerprint,))
+                con.executemany(
+                    "INSERT OR REPLACE INTO matches(key, deps, pass, pos, score, s2_name, s2_model, used_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(k,) + e + (now,) for k, e in self.dirty.items()],
+                )
+        finally:
+            con.close()
+        self.dirty.clear()
+        self.cleared = False
+
+    def report(self) -> str:
+        total = self.hits + self.misses
+        rate = (self.hits / total * 100.0) if total else 0.0
+        return f"hit {self.hits}/{total} ({rate:.1f}%)" + ("（マッチャー変更のため作り直し）" if self.rebuilt else "")
@@ -0,0 +1,168 @@
+﻿# -*- coding: utf-8 -*-
+r"""
+買取価格ルール（表駆動）: シート2の金額 → シート1(O列)の新価格
+
+ルール（JSON / dict）:
+  {
+    "factor": 0.95,                                  # 掛け率（小数は分数として厳密に扱う: 0.95 = 19/20）
+    "overrides": {"10": 10, "30": 10, "50": 10, "100": 50},   # S2金額(整数化後)の固定値
+    "bands": [                                       # base(=floor(S2*factor)) の下限の大きい順に最初に当たった帯
+                                                     # （どれにも当たらない base（負の金額など）は一番下の帯）
+      {"min": 100000, "unit": 10000, "mode": "ceil"},
+      {"min": 10000,  "unit": 1000,  "mode": "floor"},
+      {"min": 0,      "unit": 100,   "mode": "floor"}
+    ]
+  }
+  mode: floor=切り捨て / ceil=切り上げ / round=四捨五入
+
+- PriceRules.apply(price)     : 1件（Python の整数演算）
+- PriceRules.evaluate(prices) : 配列をまとめて（NumPy があればベクトル化、無ければ apply のループ）
+- NaN / inf の金額は ValueError（O列に書かせない）
+
+What-if（シート2全件を現行ルールと比較）:
+  python price_rules.py --rules my_rules.json
+"""
+
+import argparse
+import json
+import math
+import time
+from fractions import Fraction
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# ---- NumPy (任意) ----
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+DEFAULT_RULES: Dict[str, Any] = {
+    "factor": 0.95,
+    "overrides": {"10": 10, "30": 10, "50": 10, "100": 50},
+    "bands": [
+        {"min": 100000, "unit": 10000, "mode": "ceil"},
+        {"min": 10000, "unit": 1000, "mode": "floor"},
+        {"min": 0, "unit": 100, "mode": "floor"},
+    ],
+}
+
+ROUND_MODES = ("floor", "ceil", "round")
+
+
+def _round_unit(base: int, unit: int, mode: str) -> int:
+    if mode == "ceil":
+        return ((base + unit - 1) // unit) * unit
+    if mode == "round":
+        return ((base + unit // 2) // unit) * unit
+    return (base // unit) * unit
+
+
+class PriceRules:
+    def __init__(self, rules: Optional[Dict[str, Any]] = None):
+        rules = DEFAULT_RULES if rules is None else rules
+        factor = Fraction(str(rules.get("factor", 1)))
+        self.num, self.den = factor.numerator, factor.denominator
+        self.overrides: Dict[int, int] = {int(k): int(v) for k, v in (rules.get("overrides") or {}).items()}
+        bands: List[Tuple[int, int, str]] = []
+        for b in rules.get("bands") or []:
+            mode = str(b.get("mode", "floor"))
+            if mode not in ROUND_MODES:
+                raise ValueError(f"unknown rounding mode: {mode}")
+            unit = int(b["unit"])
+            if unit <= 0:
+                raise ValueError(f"unit must be > 0: {unit}")
+            bands.append((int(b.get("min", 0)), unit, mode))
+        self.bands = sorted(bands, key=lambda t: t[0], reverse=True)
+
+    @classmethod
+    def load(cls, path: Optional[str]) -> "PriceRules":
+        if not path:
+            return cls()
+        return cls(json.loads(Path(path).read_text(encoding="utf-8-sig")))
+
+    def apply(self, s2_price: float) -> int:
+        v = float(s2_price)
+        if not math.isfinite(v):
+            raise ValueError(f"S2金額が数値ではありません: {s2_price!r}")
+        s2_int = int(round(v))
+        fixed = self.overrides.get(s2_int)
+        if fixed is not None:
+            return fixed
+        base = (s2_int * self.num) // self.den
+        for lo, unit, mode in self.bands:
+            if base >= lo:
+                return _round_unit(base, unit, mode)
+        if self.bands:
+            # 一番下の帯は下限未満も受け持つ（旧 calc_new_price_from_s2 の「それ以外は100円単位切り捨て」）
+            _lo, unit, mode = self.bands[-1]
+            return _round_unit(base, unit, mode)
+        return base
+
+    def evaluate(self, s2_prices: Iterable[float]):
+        """S2金額の配列 → 新価格の配列（NumPy があれば int64 の ndarray、無ければ list）"""
+        if np is None:
+            return [self.apply(p) for p in s2_prices]
+
+        # round() と同じ偶数丸め（np.rint）で整数化。NaN/inf は int64 にすると任意の値になるので先に弾く
+        f = np.asarray(s2_prices, dtype=np.float64)
+        bad = ~np.isfinite(f)
+        if bad.any():
+            k = int(np.flatnonzero(bad)[0])
+            raise ValueError(f"S2金額が数値ではありません: {float(f[k])!r}（{int(bad.sum())} 件, 先頭 index {k}）")
+        p = np.rint(f).astype(np.int64)
+        base = (p * self.num) // self.den
+        out = base.copy()
+        todo = np.ones(base.shape, dtype=bool)
+        for n, (lo, unit, mode) in enumerate(self.bands):
+            m = todo if n == len(self.bands) - 1 else todo & (base >= lo)
+            if mode == "ceil":
+                out[m] = ((base[m] + unit - 1) // unit) * unit
+            elif mode == "round":
+                out[m] = ((base[m] + unit // 2) // unit) * unit
+            else:
+                out[m] = (base[m] // unit) * unit
+            todo &= ~m
+        for k, v in self.overrides.items():
+            out[p == k] = v
+        return out
+
+
+# ---------- What-if ----------
+def _load_s2_prices(xlsm: str) -> List[float]:
+    from openpyxl import load_workbook
+    import 値段更新 as upd
+
+    wb = load_workbook(xlsm, read_only=True, data_only=False)
+    try:
+        prices = [upd.to_number(price) for _r, _n, _m, price in upd.iter_s2_rows(wb[upd.SHEET2])]
+    finally:
+        wb.close()
+    return [p for p in prices if p is not None]
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="価格ルールの What-if（シート2全件を現行ルールと比較）")
+    ap.add_argument("--rules", default=None, help="比較するルールJSON（省略時は現行ルール同士）")
+    ap.add_argument("--xlsm", default=str(Path(__file__).resolve().parent / "buylist.xlsm"))
+    args = ap.parse_args()
+
+    prices = _load_s2_prices(args.xlsm)
+    cur, new = PriceRules(), PriceRules.load(args.rules)
+
+    t0 = time.perf_counter()
+    a = cur.evaluate(prices)
+    b = new.evaluate(prices)
+    dt = time.perf_counter() - t0
+
+    diff = [(p, x, y) for p, x, y in zip(prices, a, b) if int(x) != int(y)]
+    print(f"[what-if] rows={len(prices)} eval={dt * 1000:.2f} ms ({'numpy' if np is not None else 'python'})")
+    print(f"   total: current={sum(int(x) for x in a):,} new={sum(int(y) for y in b):,}")
+    print(f"   changed rows: {len(diff)}")
+    for p, x, y in diff[:10]:
+        print(f"     S2={p:>10,.0f}  {int(x):>9,} -> {int(y):>9,}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,401 @@
+﻿# -*- coding: utf-8 -*-
+r"""
+xlsm（OOXML zip）を openpyxl で丸ごと読み書きせずに、一部のパーツだけ差し替えるための小道具。
+
+- 差し替えないパーツは圧縮済みバイト列をそのままコピー（再圧縮しない＝中身もバイト単位で同一）
+- 差し替えるパーツは writer コールバックがストリームで書き込む
+- 出力は一時ファイルに書いてから os.replace（途中失敗で元ファイルを壊さない）
+- patch_cells: ワークシートXMLの指定セルだけ差し替え（行・セルの順序とスタイルは維持）
+- iter_sheet_values: ワークシートXMLを行単位でストリーム読みし、必要な列のセルだけ値にする
+  （値の型は openpyxl の read_only + data_only と同じ。日付書式のセルなど未対応のものは ValueError）
+"""
+
+import os
+import posixpath
+import re
+import struct
+import tempfile
+import zipfile
+import xml.etree.ElementTree as ET
+from typing import IO, Any, Callable, Dict, Iterator, List, Optional
+
+NS_MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+NS_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+NS_PKG_REL = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+# writer(zin, out): 差し替えパーツの中身を out に書く
+PartWriter = Callable[[zipfile.ZipFile, IO[bytes]], None]
+
+_LOCAL_HEADER_SIZE = 30
+_FLAG_DATA_DESCRIPTOR = 0x08
+
+
+def sheet_names(zf: zipfile.ZipFile) -> List[str]:
+    """ブック内のシート名（並び順）"""
+    wb = ET.fromstring(zf.read("xl/workbook.xml"))
+    return [sh.get("name") or "" for sh in wb.iter(f"{{{NS_MAIN}}}sheet")]
+
+
+def find_sheet_part(zf: zipfile.ZipFile, sheet_name: str) -> Optional[str]:
+    """シート名 → zip内のワークシートXMLパス（例: xl/worksheets/sheet2.xml）。無ければ None。"""
+    try:
+        wb = ET.fromstring(zf.read("xl/workbook.xml"))
+        rels = ET.fromstring(zf.read("xl/_rels/workbook.xml.rels"))
+    except KeyError:
+        return None
+    rid = None
+    for sh in wb.iter(f"{{{NS_MAIN}}}sheet"):
+        if sh.get("name") == sheet_name:
+            rid = sh.get(f"{{{NS_REL}}}id")
+            break
+    if rid is None:
+        return None
+    for rel in rels.iter(f"{{{NS_PKG_REL}}}Relationship"):
+        if rel.get("Id") == rid:
+            target = rel.get("Target") or ""
+            if target.startswith("/"):
+                return target.lstrip("/")
+            return posixpath.normpath(posixpath.join("xl", target))
+    return None
+
+
+def copy_member_raw(zin: zipfile.ZipFile, zout: zipfile.ZipFile, info: zipfile.ZipInfo):
+    """圧縮済みデータを展開せずにそのまま zout へ追記する"""
+    fp = zin.fp
+    fp.seek(info.header_offset)
+    header = fp.read(_LOCAL_HEADER_SIZE)
+    name_len, extra_len = struct.unpack("<HH", header[26:30])
+    fp.seek(info.header_offset + _LOCAL_HEADER_SIZE + name_len + extra_len)
+    data = fp.read(info.compress_size)
+
+    zi = zipfile.ZipInfo(info.filename, date_time=info.date_time)
+    zi.compress_type = info.compress_type
+    zi.create_system = info.create_system
+    zi.external_attr = info.external_attr
+    zi.flag_bits = info.flag_bits & ~_FLAG_DATA_DESCRIPTOR
+    zi.CRC = info.CRC
+    zi.compress_size = info.compress_size
+    zi.file_size = info.file_size
+    zi.header_offset = zout.fp.tell()
+    zout.fp.write(zi.FileHeader())
+    zout.fp.write(data)
+    zout.filelist.append(zi)
+    zout.NameToInfo[zi.filename] = zi
+    zout.start_dir = zout.fp.tell()
+    zout._didModify = True
+
+
+def rewrite_members(src_path: str, replacements: Dict[str, PartWriter], dst_path: Optional[str] = None) -> str:
+    """
+    src_path の zip を dst_path（省略時は上書き）へ書き出す。
+    replacements のパーツだけ writer で書き直し、それ以外は raw コピー。
+    """
+    dst_path = dst_path or src_path
+    missing = set(replacements)
+    fd, tmp = tempfile.mkstemp(prefix=".~", suffix=".tmp", dir=os.path.dirname(os.path.abspath(dst_path)))
+    os.close(fd)
+    try:
+        with zipfile.ZipFile(src_path, "r") as zin, zipfile.ZipFile(tmp, "w") as zout:
+            for info in zin.infolist():
+                writer = replacements.get(info.filename)
+                if writer is None:
+                    copy_member_raw(zin, zout, info)
+                    continue
+                missing.discard(info.filename)
+                zi = zipfile.ZipInfo(info.filename, date_time=info.date_time)
+                zi.compress_type = zipfile.ZIP_DEFLATED
+                zi.external_attr = info.external_attr
+                with zout.open(zi, "w") as out:
+                    writer(zin, out)
+        if missing:
+            raise KeyError(f"parts not found in {src_path}: {sorted(missing)}")
+        os.replace(tmp, dst_path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    return dst_path
+
+
+# ===== ワークシートXML =====
+_XML_ILLEGAL = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+_RE_SHEETDATA_OPEN = re.compile(rb"<sheetData\b[^>]*?(/?)>")
+_RE_DIMENSION = re.compile(rb"<dimension\b[^>]*/>")
+_RE_ROW_OPEN = re.compile(rb'<row\b[^>]*?\br="(\d+)"[^>]*?(/?)>')
+_RE_CELL = re.compile(rb'<c\b[^>]*?\br="([A-Z]+)\d+"[^>]*?(?:/>|>.*?</c>)', re.S)
+_RE_STYLE = re.compile(rb'\bs="(\d+)"')
+
+
+def col_letter(idx: int) -> str:
+    """1始まり列番号 → A, B, …, AA"""
+    s = ""
+    while idx > 0:
+        idx, rem = divmod(idx - 1, 26)
+        s = chr(65 + rem) + s
+    return s
+
+
+def col_index(letters: str) -> int:
+    """A, B, …, AA → 1始まり列番号"""
+    n = 0
+    for ch in letters:
+        n = n * 26 + (ord(ch) - 64)
+    return n
+
+
+def xml_escape(s: str) -> str:
+    s = _XML_ILLEGAL.sub("", s)
+    return s.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def cell_xml(ref: str, v, style: Optional[str] = None) -> str:
+    """1セル分の <c>（None は空文字＝セルを出さない）。文字列は inlineStr。style は s 属性（スタイル番号）。"""
+    st = f' s="{style}"' if style else ""
+    if v is None:
+        return ""
+    if isinstance(v, bool):
+        return f'<c r="{ref}"{st} t="b"><v>{int(v)}</v></c>'
+    if isinstance(v, (int, float)):
+        return f'<c r="{ref}"{st} t="n"><v>{v}</v></c>'
+    s = str(v)
+    if s == "":
+        return ""
+    sp = ' xml:space="preserve"' if s != s.strip() else ""
+    return f'<c r="{ref}"{st} t="inlineStr"><is><t{sp}>{xml_escape(s)}</t></is></c>'
+
+
+def iter_rows_xml(rows, start_row: int = 1) -> Iterator[str]:
+    for r_idx, row in enumerate(rows, start=start_row):
+        cells = "".join(cell_xml(f"{col_letter(c_idx)}{r_idx}", v) for c_idx, v in enumerate(row, start=1))
+        yield f'<row r="{r_idx}">{cells}</row>'
+
+
+def split_sheet_xml(zin: zipfile.ZipFile, part: str, chunk_size: int = 1 << 20):
+    """
+    ワークシートXMLを <sheetData> の前後で分割して返す（prefix, suffix）。
+    sheetData の中身は読み捨てるだけでメモリに保持しない。
+    """
+    prefix = b""
+    with zin.open(part) as f:
+        buf = b""
+        m = None
+        while True:
+            chunk = f.read(chunk_size)
+            buf += chunk
+            m = _RE_SHEETDATA_OPEN.search(buf)
+            if m or not chunk:
+                break
+        if not m:
+            raise ValueError(f"<sheetData> not found in {part}")
+        prefix = buf[:m.start()]
+        if m.group(1) == b"/":  # <sheetData/>
+            rest = buf[m.end():] + f.read()
+            return prefix, rest
+        buf = buf[m.end():]
+        close = b"</sheetData>"
+        while True:
+            i = buf.find(close)
+            if i != -1:
+                return prefix, buf[i + len(close):] + f.read()
+            chunk = f.read(chunk_size)
+            if not chunk:
+                raise ValueError(f"</sheetData> not found in {part}")
+            buf = buf[-(len(close) - 1):] + chunk
+
+
+def set_dimension(prefix: bytes, ref: str) -> bytes:
+    new = f'<dimension ref="{ref}"/>'.encode("ascii")
+    if _RE_DIMENSION.search(prefix):
+        return _RE_DIMENSION.sub(new, prefix, count=1)
+    return prefix
+
+
+def _patch_row(content: bytes, r: int, cols: Dict[int, Any]) -> bytes:
+    """<row> の中身のうち cols の列のセルを差し替え（無ければ列順の位置に挿入）"""
+    pending = sorted(cols)
+    out: List[bytes] = []
+    pos = 0
+    pi = 0
+    for cm in _RE_CELL.finditer(content):
+        c = col_index(cm.group(1).decode("ascii"))
+        while pi < len(pending) and pending[pi] < c:
+            out.append(content[pos:cm.start()])
+            pos = cm.start()
+            out.append(cell_xml(f"{col_letter(pending[pi])}{r}", cols[pending[pi]]).encode("utf-8"))
+            pi += 1
+        if pi < len(pending) and pending[pi] == c:
+            tag = cm.group(0)[:cm.group(0).index(b">") + 1]
+            sm = _RE_STYLE.search(tag)
+            style = sm.group(1).decode("ascii") if sm else None
+            out.append(content[pos:cm.start()])
+            out.append(cell_xml(f"{col_letter(c)}{r}", cols[c], style).encode("utf-8"))
+            pos = cm.end()
+            pi += 1
+    out.append(content[pos:])
+    for c in pending[pi:]:
+        out.append(cell_xml(f"{col_letter(c)}{r}", cols[c]).encode("utf-8"))
+    return b"".join(out)
+
+
+def _new_row_xml(r: int, cols: Dict[int, Any]) -> bytes:
+    return f'<row r="{r}">'.encode("ascii") + _patch_row(b"", r, cols) + b"</row>"
+
+
+def patch_cells(xml: bytes, updates: Dict[int, Dict[int, Any]]) -> bytes:
+    """
+    ワークシートXMLのうち updates[行番号][列番号] = 値 のセルだけ差し替える。
+    既存セルはスタイル(s)を引き継いで値で置き換え（数式・型も置き換わる）、無いセル・行は順序どおりに挿入。
+    それ以外のバイト列は一切変えない。
+    """
+    m = _RE_SHEETDATA_OPEN.search(xml)
+    if not m:
+        raise ValueError("<sheetData> not found")
+    pending = sorted(updates)
+    if m.group(1) == b"/":  # <sheetData/>
+        rows = b"".join(_new_row_xml(r, updates[r]) for r in pending)
+        return xml[:m.start()] + b"<sheetData>" + rows + b"</sheetData>" + xml[m.end():]
+
+    body_end = xml.find(b"</sheetData>", m.end())
+    if body_end == -1:
+        raise ValueError("</sheetData> not found")
+    out: List[bytes] = []
+    pos = m.end()
+    pi = 0
+    out.append(xml[:pos])
+    for rm in _RE_ROW_OPEN.finditer(xml, m.end(), body_end):
+        if pi >= len(pending):
+            break
+        r = int(rm.group(1))
+        while pi < len(pending) and pending[pi] < r:
+            out.append(xml[pos:rm.start()])
+            pos = rm.start()
+            out.append(_new_row_xml(pending[pi], updates[pending[pi]]))
+            pi += 1
+        if pi >= len(pending) or pending[pi] != r:
+            continue
+        if rm.group(2) == b"/":  # <row .../>
+            open_tag = rm.group(0)[:-2] + b">"
+            content = b""
+            row_end = rm.end()
+        else:
+            open_tag = rm.group(0)
+            close = xml.find(b"</row>", rm.end(), body_end)
+            if close == -1:
+                raise ValueError(f"</row> not found for row {r}")
+            content = xml[rm.end():close]
+            row_end = close + len(b"</row>")
+        out.append(xml[pos:rm.start()])
+        out.append(open_tag + _patch_row(content, r, updates[r]) + b"</row>")
+        pos = row_end
+        pi += 1
+    out.append(xml[pos:body_end])
+    for r in pending[pi:]:
+        out.append(_new_row_xml(r, updates[r]))
+    out.append(xml[body_end:])
+    return b"".join(out)
+
+
+# ===== ワークシートXMLの読み取り =====
+_TAG_ROW = f"{{{NS_MAIN}}}row"
+_TAG_V = f"{{{NS_MAIN}}}v"
+_TAG_IS = f"{{{NS_MAIN}}}is"
+_TAG_T = f"{{{NS_MAIN}}}t"
+_PATH_RUN_T = f"{{{NS_MAIN}}}r/{{{NS_MAIN}}}t"
+_COL_INDEX: Dict[str, int] = {}
+
+
+def _rich_text(node) -> str:
+    """<si> / <is> → 文字列（直下の <t> と <r><t> を連結。ルビ <rPh> は除く）"""
+    plain = node.find(_TAG_T)
+    parts = [plain.text or ""] if plain is not None else []
+    parts += [t.text or "" for t in node.findall(_PATH_RUN_T)]
+    return "".join(parts)
+
+
+def read_shared_strings(zf: zipfile.ZipFile) -> List[str]:
+    try:
+        root = ET.fromstring(zf.read("xl/sharedStrings.xml"))
+    except KeyError:
+        return []
+    return [_rich_text(si) for si in root.iter(f"{{{NS_MAIN}}}si")]
+
+
+# openpyxl の組み込み表示形式のうち日付/時刻になるもの（BUILTIN_FORMATS を is_date_format で判定した結果）
+_BUILTIN_DATE_FMT_IDS = frozenset(range(14, 23)) | frozenset(range(45, 48))
+
+
+def date_style_ids(zf: zipfile.ZipFile) -> set:
+    """日付/時刻の表示形式になっているスタイル番号（cellXfs の添字）。判定は openpyxl と同じ。"""
+    try:
+        root = ET.fromstring(zf.read("xl/styles.xml"))
+    except KeyError:
+        return set()
+    custom = {int(n.get("numFmtId", "0")): n.get("formatCode") or "" for n in root.iter(f"{{{NS_MAIN}}}numFmt")}
+    custom_dates = set()
+    if custom:  # 独自の表示形式があるときだけ openpyxl の判定関数を使う（import が重いため）
+        from openpyxl.styles.numbers import BUILTIN_FORMATS_REVERSE, is_date_format
+        for fid, code in custom.items():
+            builtin = BUILTIN_FORMATS_REVERSE.get(code)
+            if builtin in _BUILTIN_DATE_FMT_IDS or (builtin is None and is_date_format(code)):
+                custom_dates.add(fid)
+    xfs = root.find(f"{{{NS_MAIN}}}cellXfs")
+    out = set()
+    for i, xf in enumerate(xfs if xfs is not None else []):
+        fid = int(xf.get("numFmtId", "0"))
+        if fid in custom_dates or (fid not in custom and fid in _BUILTIN_DATE_FMT_IDS):
+            out.add(i)
+    return out
+
+
+def iter_sheet_values(zf: zipfile.ZipFile, part: str, cols_for_row: Callable[[int], Optional[set]],
+                     shared: List[str], date_styles: set, error_value: Any = None) -> Iterator[tuple]:
+    """
+    ワークシートXMLを行単位でストリーム読みして (行番号, {列番号(1始まり): 値}) を返す。
+    cols_for_row(行番号) が None ならその行は全列、集合ならその列だけ値にする（他の列は解釈しない）。
+    値は openpyxl（read_only, data_only=True）と同じ型: 数値は int/float、真偽は bool、空セルは None。
+    エラーセル（#N/A など）は error_value。日付書式の数値セルなど未対応のものは ValueError。
+    """
+    r = 0
+    with zf.open(part) as f:
+        for _ev, row in ET.iterparse(f):
+            if row.tag != _TAG_ROW:
+                continue
+            r = int(row.get("r") or r + 1)
+            cols = cols_for_row(r)
+            out: Dict[int, Any] = {}
+            c = 0
+            for cell in row:
+                ref = cell.get("r")
+                if ref:
+                    letters = ref.rstrip("0123456789")
+                    c = _COL_INDEX.get(letters) or _COL_INDEX.setdefault(letters, col_index(letters))
+                else:
+                    c += 1
+                if cols is not None and c not in cols:
+                    continue
+                t = cell.get("t", "n")
+                if t == "inlineStr":
+                    node = cell.find(_TAG_IS)
+                    out[c] = _rich_text(node) if node is not None else None
+                    continue
+                v = cell.findtext(_TAG_V) or None
+                if v is None:
+                    out[c] = None
+                elif t == "n":
+                    if int(cell.get("s") or 0) in date_styles:
+                        raise ValueError(f"date-formatted cell {ref or c} in row {r}")
+                    out[c] = float(v) if ("." in v or "E" in v or "e" in v) else int(v)
+                elif t == "s":
+                    out[c] = shared[int(v)]
+                elif t == "b":
+                    out[c] = bool(int(v))
+                elif t == "str":
+                    out[c] = v
+                elif t == "e":
+                    out[c] = error_value
+                else:
+                    raise ValueError(f"unsupported cell type {t!r} at {ref or c} in row {r}")
+            row.clear()
+            yield r, out
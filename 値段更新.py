@@ -12,12 +12,31 @@ buylist.xlsm：シート1とシート2をマッチングし、
     * new < 10000  : 100円単位で切り捨て（285 -> 200）
     * new >= 10000 : 1000円単位で切り捨て（10950 -> 10000）
 - マッチしない行は O列を変更しない
+- ルールは price_rules.py（表駆動）。--price-rules でJSONのルールに差し替え可
+
+シート2の代わりに cardrush_to_excel.py --snapshot-db のスナップショット（最新）を使う場合:
+  python 値段更新.py --s2-snapshot cardrush_history.sqlite
+
+ブックを書き換えずにマッチ結果だけ確認する場合（1行1JSON。ロック行も含めて全行を出力）:
+  python 値段更新.py --dry-run --report out.jsonl
 """
 
 from __future__ import annotations
 
+import argparse
+import hashlib
+import json
+import multiprocessing
+import sys
+import time
+import tracemalloc
+import zipfile
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 import unicodedata
 import re
 from difflib import SequenceMatcher
@@ -26,6 +45,15 @@ from datetime import date, datetime
 from openpyxl import load_workbook
 from openpyxl.utils.datetime import from_excel
 
+import price_rules
+import xlsm_zip
+
+# ---- resource（任意。Windows には無い）----
+try:
+    import resource
+except Exception:
+    resource = None
+
 
 # ===== 設定 =====
 XLSM_PATH = str(Path(__file__).resolve().parent / "buylist.xlsm")
@@ -48,11 +76,101 @@ S2_COL_MODEL = 2   # B
 S2_COL_PRICE = 3   # C
 S2_HEADER_ROWS = 1
 
+# O列の書き戻し方式（patch=シート1XMLの該当セルだけ差し替え / openpyxl=ブック全体を保存）
+DEFAULT_WRITER = "patch"
+
 # ===== 名前ガード =====
 NAME_HARD_REJECT = 0.75
 NAME_REQUIRED_FOR_STRICT = 0.80
 NAME_REQUIRED_FOR_LOOSE = 0.84
 
+
+# ===== 計測（--stats / --stats-json）=====
+class MatchStats:
+    """マッチング内部のカウンタ（常時カウント。--workers のワーカー分は親で合算）"""
+    __slots__ = ("ratio_calls", "lookups", "candidates", "rainbow_scans")
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.ratio_calls = 0          # SequenceMatcher で実際に類似度を計算した回数
+        self.lookups: Dict[str, int] = {}     # 段ごとの候補リスト参照回数
+        self.candidates: Dict[str, int] = {}  # 段ごとの候補数の合計
+        self.rainbow_scans = 0        # 虹の吸われ防止で非虹行を引き直した回数
+
+    def count_lookup(self, pass_name: str, n_candidates: int):
+        self.lookups[pass_name] = self.lookups.get(pass_name, 0) + 1
+        self.candidates[pass_name] = self.candidates.get(pass_name, 0) + n_candidates
+
+    def merge(self, d: Dict[str, Any]):
+        self.ratio_calls += d["ratio_calls"]
+        self.rainbow_scans += d["rainbow_scans"]
+        for k, v in d["lookups"].items():
+            self.lookups[k] = self.lookups.get(k, 0) + v
+        for k, v in d["candidates"].items():
+            self.candidates[k] = self.candidates.get(k, 0) + v
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "ratio_calls": self.ratio_calls,
+            "rainbow_scans": self.rainbow_scans,
+            "lookups": dict(self.lookups),
+            "candidates": dict(self.candidates),
+            "avg_candidates": {k: round(self.candidates[k] / n, 3) for k, n in self.lookups.items() if n},
+        }
+
+STATS = MatchStats()
+
+
+def _peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024  # macOS は bytes、Linux は KB
+
+
+class StageTimer:
+    """ステージごとの所要時間・ピークRSS（trace_memory=True なら tracemalloc のPythonヒープピークも）"""
+
+    def __init__(self, trace_memory: bool = False):
+        self.stages: List[Dict[str, Any]] = []
+        self.trace_memory = trace_memory
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name: str):
+        """with timer.stage("match") as rec: ...  rec["rows"] を入れると rows/s も出す"""
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        rec: Dict[str, Any] = {"stage": name}
+        t0 = time.perf_counter()
+        try:
+            yield rec
+        finally:
+            rec["seconds"] = round(time.perf_counter() - t0, 4)
+            if rec.get("rows") and rec["seconds"] > 0:
+                rec["rows_per_sec"] = round(rec["rows"] / rec["seconds"], 1)
+            if self.trace_memory:
+                rec["py_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 2)
+            rss = _peak_rss_mb()
+            if rss is not None:
+                rec["rss_peak_mb"] = round(rss, 1)
+            self.stages.append(rec)
+
+    def summary_lines(self) -> List[str]:
+        w = max([10] + [len(rec["stage"]) for rec in self.stages])
+        lines = [f"   {'stage':<{w}} {'sec':>8} {'rows':>8} {'rows/s':>10} {'rss MB':>8}"
+                 + (f" {'py MB':>8}" if self.trace_memory else "")]
+        for rec in self.stages:
+            line = (f"   {rec['stage']:<{w}} {rec['seconds']:>8.3f} {rec.get('rows', ''):>8} "
+                    f"{rec.get('rows_per_sec', ''):>10} {rec.get('rss_peak_mb', ''):>8}")
+            if self.trace_memory:
+                line += f" {rec.get('py_peak_mb', ''):>8}"
+            lines.append(line)
+        return lines
+
 # ===== 正規化 =====
 _re_spaces = re.compile(r"\s+")
 _re_keep_alnum = re.compile(r"[^0-9A-Z]+")   # 英数字以外を除去（LOOSE用）
@@ -113,13 +231,17 @@ _ROMAN_MAP = {
     "ⅺ": "XI", "ⅻ": "XII", "ⅼ": "L", "ⅽ": "C", "ⅾ": "D", "ⅿ": "M",
 }
 
+_ROMAN_KEYS = sorted(_ROMAN_MAP.keys(), key=len, reverse=True)
+
 def roman_unicode_to_ascii(s: str) -> str:
     if not s:
         return s
-    for k in sorted(_ROMAN_MAP.keys(), key=len, reverse=True):
+    for k in _ROMAN_KEYS:
         s = s.replace(k, _ROMAN_MAP[k])
     return s
 
+# 型番・カード名はシート間/行間で同じ文字列が何度も出るのでキャッシュ
+@lru_cache(maxsize=65536)
 def nfkc(s: str) -> str:
     s = unicodedata.normalize("NFKC", s)
     s = roman_unicode_to_ascii(s)
@@ -316,17 +438,133 @@ def ratio(a: str, b: str) -> float:
     return SequenceMatcher(None, a, b).ratio()
 
 
+# ===== 名前類似度の上限（SequenceMatcher の前の足切り）=====
+# ratio = 2*M / (len(a)+len(b)) の M（一致文字数）は、両者の文字の多重集合の共通部分を超えない。
+# → 共通文字数から同じ式で求めた値は ratio の厳密な上限（difflib の quick_ratio と同じ考え方）。
+#   上限が「現在のベスト以下」または「合格ライン未満」の候補は ratio を計算しなくても結果が変わらない。
+# 生き残った候補は ratio_to で計算する（シート2名側の SequenceMatcher を使い回す。結果は ratio と同値）。
+NAME_PREFILTER = True
+
+_s2_matchers: Dict[str, SequenceMatcher] = {}
+
+def ratio_to(a: str, b: str) -> float:
+    """
+    ratio(a, b) と同じ値。b（シート2の正規化名）ごとに SequenceMatcher を保持し、
+    b 側の前処理（b2j）を毎回作り直さない。
+    """
+    if not a or not b:
+        return 0.0
+    sm = _s2_matchers.get(b)
+    if sm is None:
+        sm = _s2_matchers[b] = SequenceMatcher(None, "", b)
+    sm.set_seq1(a)
+    return sm.ratio()
+
+@lru_cache(maxsize=4096)
+def name_chars(s: str) -> Dict[str, int]:
+    return Counter(s)
+
+def ratio_upper_bound(a: str, a_chars: Dict[str, int], b: str, b_chars: Dict[str, int]) -> float:
+    if not a or not b:
+        return 0.0
+    if len(a_chars) > len(b_chars):
+        a_chars, b_chars = b_chars, a_chars
+    m = 0
+    for ch, n in a_chars.items():
+        nb = b_chars.get(ch)
+        if nb:
+            m += n if n < nb else nb
+    return 2.0 * m / (len(a) + len(b))
+
+
+# ===== シート読み込み（iter_rows で1パス。read_only ブックでも使える）=====
+def _iter_row_values(ws, min_row: int, max_col: int) -> Iterator[Tuple[int, Tuple[Any, ...]]]:
+    """(行番号, 1〜max_col 列の値タプル)。短い行は None で埋める。"""
+    for r, vals in enumerate(ws.iter_rows(min_row=min_row, max_col=max_col, values_only=True), start=min_row):
+        if len(vals) < max_col:
+            vals = tuple(vals) + (None,) * (max_col - len(vals))
+        yield r, vals
+
+
+class S1Columns:
+    """シート1のマッチングに使う列（C/E/F/O/P）を列ごとのリストで持つ"""
+    __slots__ = ("rows", "name", "e", "f", "price", "lock")
+
+    def __init__(self):
+        self.rows: List[int] = []
+        self.name: List[Any] = []
+        self.e: List[Any] = []
+        self.f: List[Any] = []
+        self.price: List[Any] = []
+        self.lock: List[Any] = []
+
+
+def read_s1_columns(ws1) -> S1Columns:
+    cols = S1Columns()
+    max_col = max(S1_COL_NAME, S1_COL_E, S1_COL_F, S1_COL_PRICE, S1_COL_LOCK)
+    for r, vals in _iter_row_values(ws1, S1_HEADER_ROWS + 1, max_col):
+        cols.rows.append(r)
+        cols.name.append(vals[S1_COL_NAME - 1])
+        cols.e.append(vals[S1_COL_E - 1])
+        cols.f.append(vals[S1_COL_F - 1])
+        cols.price.append(vals[S1_COL_PRICE - 1])
+        cols.lock.append(vals[S1_COL_LOCK - 1])
+    return cols
+
+
+# ===== S2 入力 =====
+# (r, name_raw, model_raw, price_raw) を行順に返す
+def iter_s2_rows(ws2) -> Iterator[Tuple[int, Any, Any, Any]]:
+    max_col = max(S2_COL_NAME, S2_COL_MODEL, S2_COL_PRICE)
+    for r, vals in _iter_row_values(ws2, S2_HEADER_ROWS + 1, max_col):
+        yield r, vals[S2_COL_NAME - 1], vals[S2_COL_MODEL - 1], vals[S2_COL_PRICE - 1]
+
+def iter_s2_rows_from_snapshot(path: str) -> Iterator[Tuple[int, Any, Any, Any]]:
+    """
+    cardrush_to_excel.py --snapshot-db の最新スナップショットをシート2と同じ形で返す。
+    行番号はシート2に書かれた場合と同じ（ヘッダーの次から連番）。
+    """
+    import cardrush_snapshot
+
+    _sid, rows = cardrush_snapshot.load_snapshot(path)
+    for i, (name, model, amount, _cat, _rarity, _norm) in enumerate(rows):
+        yield S2_HEADER_ROWS + 1 + i, name, model, amount
+
+
 # ===== S2 index =====
-# rows[r] = (model_disp, name_raw, price, name_norm, rainbow_flag, name_raw_exact)
+class S2Row:
+    """シート2の1行。正規化・型番キー・秘種別は build_s2_indexes で1回だけ計算して持つ。"""
+    __slots__ = ("model_disp", "name_raw", "price", "name_norm", "rainbow", "name_exact",
+                 "name_chars", "key_strict", "key_loose", "secret_rank")
+
+    def __init__(self, model_disp: str, name_raw: str, price: Optional[float], name_norm: str, rainbow: bool,
+                 name_exact: str, name_chars: Dict[str, int], key_strict: str, key_loose: str, secret_rank: str):
+        self.model_disp = model_disp
+        self.name_raw = name_raw
+        self.price = price
+        self.name_norm = name_norm
+        self.rainbow = rainbow
+        self.name_exact = name_exact
+        self.name_chars = name_chars
+        self.key_strict = key_strict
+        self.key_loose = key_loose
+        self.secret_rank = secret_rank
+
+
+# rows[r] = S2Row
+# strict_map[(key_strict, secret_rank)] / loose_map[(key_loose, secret_rank)] = [r, ...]（行順。秘種別で分割済み）
+# name_map[(name_norm, rainbow_flag, secret_rank)] = [r, ...]（行順。虹の吸われ防止の引き直し用）
 def build_s2_indexes(ws2):
-    strict_map: Dict[str, List[int]] = {}
-    loose_map: Dict[str, List[int]] = {}
-    rows: Dict[int, Tuple[str, str, Optional[float], str, bool, str]] = {}
+    return build_s2_indexes_from_rows(iter_s2_rows(ws2))
+
+def build_s2_indexes_from_rows(s2_iter: Iterable[Tuple[int, Any, Any, Any]]):
+    strict_map: Dict[Tuple[str, str], List[int]] = {}
+    loose_map: Dict[Tuple[str, str], List[int]] = {}
+    rows: Dict[int, S2Row] = {}
+    name_map: Dict[Tuple[str, bool, str], List[int]] = {}
 
-    for r in range(S2_HEADER_ROWS + 1, ws2.max_row + 1):
-        name_raw = ws2.cell(r, S2_COL_NAME).value
-        model_raw = ws2.cell(r, S2_COL_MODEL).value
-        price = to_number(ws2.cell(r, S2_COL_PRICE).value)
+    for r, name_raw, model_raw, price_raw in s2_iter:
+        price = to_number(price_raw)
 
         name_raw_s = "" if name_raw is None else str(name_raw).strip()
         model_disp = s2_model_raw_display(model_raw)
@@ -338,14 +576,18 @@ def build_s2_indexes(ws2):
         rb = has_rainbow_mark_raw(name_raw_s)
         raw_exact = norm_name_raw_exact(name_raw_s)
 
-        rows[r] = (model_disp, name_raw_s, price, n_name, rb, raw_exact)
+        rank = secret_rank(model_disp)
+
+        rows[r] = S2Row(model_disp, name_raw_s, price, n_name, rb, raw_exact, name_chars(n_name),
+                        k_strict, k_loose, rank)
+        name_map.setdefault((n_name, rb, rank), []).append(r)
 
         if k_strict:
-            strict_map.setdefault(k_strict, []).append(r)
+            strict_map.setdefault((k_strict, rank), []).append(r)
         if k_loose:
-            loose_map.setdefault(k_loose, []).append(r)
+            loose_map.setdefault((k_loose, rank), []).append(r)
 
-    return strict_map, loose_map, rows
+    return strict_map, loose_map, rows, name_map
 
 
 def pick_best_by_name_with_rainbow_preference(
@@ -353,35 +595,58 @@ def pick_best_by_name_with_rainbow_preference(
     s1_name_n: str,
     s1_name_exact: str,
     s1_rainbow: bool,
-    s2_rows: Dict[int, Tuple[str, str, Optional[float], str, bool, str]],
+    s2_rows: Dict[int, S2Row],
+    min_score: float = 0.0,
 ) -> Tuple[Optional[int], float]:
     """
     虹優先ロジック + raw完全一致優先 + 正規化名完全一致優先 + 類似度ベスト
+
+    min_score: 呼び出し側の合格ライン。上限がこれ未満の候補は ratio を計算しない
+    （ベストが合格ライン以上ならベストは変わらない／未満ならどのみち不採用）。
     """
     def filter_by_rainbow_rule(cands: List[int]) -> List[int]:
         if not cands:
             return []
         if s1_rainbow:
-            return [r2 for r2 in cands if s2_rows[r2][4] is True]
-        non_rb = [r2 for r2 in cands if s2_rows[r2][4] is False]
+            return [r2 for r2 in cands if s2_rows[r2].rainbow is True]
+        non_rb = [r2 for r2 in cands if s2_rows[r2].rainbow is False]
         return non_rb if non_rb else cands
 
     def best_of(cands: List[int]) -> Tuple[Optional[int], float]:
         if not cands:
             return None, 0.0
 
-        exact_raw = [r2 for r2 in cands if s2_rows[r2][5] == s1_name_exact]
+        exact_raw = [r2 for r2 in cands if s2_rows[r2].name_exact == s1_name_exact]
         if exact_raw:
             return exact_raw[0], 1.0
 
-        exact_norm = [r2 for r2 in cands if s2_rows[r2][3] == s1_name_n]
+        exact_norm = [r2 for r2 in cands if s2_rows[r2].name_norm == s1_name_n]
         if exact_norm:
             return exact_norm[0], 1.0
 
         best_r = None
         best_sc = 0.0
+        s1_chars = None
         for r2 in cands:
-            sc = ratio(s1_name_n, s2_rows[r2][3])
+            row = s2_rows[r2]
+            n2 = row.name_norm
+            if NAME_PREFILTER:
+                # まず長さだけの上限（real_quick_ratio 相当）、次に文字多重集合の上限
+                la, lb = len(s1_name_n), len(n2)
+                ub = 2.0 * (la if la < lb else lb) / (la + lb) if (la and lb) else 0.0
+                if ub <= best_sc or ub < min_score:
+                    continue
+                if s1_chars is None:
+                    s1_chars = name_chars(s1_name_n)
+                # 上限 <= best_sc なら「より大きい」にはなれない（同点は先勝ちのまま）
+                ub = ratio_upper_bound(s1_name_n, s1_chars, n2, row.name_chars)
+                if ub <= best_sc or ub < min_score:
+                    continue
+                STATS.ratio_calls += 1
+                sc = ratio_to(s1_name_n, n2)
+            else:
+                STATS.ratio_calls += 1
+                sc = ratio(s1_name_n, n2)
             if sc > best_sc:
                 best_sc = sc
                 best_r = r2
@@ -406,27 +671,12 @@ def calc_new_price_from_s2(s2_price: float) -> int:
       - base >= 100000 : 10000円単位で切り上げ（127000 -> 130000）
       - base >= 10000  : 1000円単位で切り捨て（10950 -> 10000）
       - base < 10000   : 100円単位で切り捨て（285 -> 200）
-    """
-    s2_int = int(round(float(s2_price)))
 
-    # 低価格例外
-    if s2_int in (10, 30, 50):
-        return 10
-    if s2_int == 100:
-        return 50
-
-    base = int((s2_int * 95) // 100)
-
-    # ★追加：10万以上は1万円単位で切り上げ
-    if base >= 100000:
-        return ((base + 9999) // 10000) * 10000
-
-    # 既存：1万以上は1000円単位で切り捨て
-    if base >= 10000:
-        return (base // 1000) * 1000
+    （price_rules.DEFAULT_RULES と同じ。まとめて計算するときは PriceRules.evaluate）
+    """
+    return _DEFAULT_PRICE_RULES.apply(s2_price)
 
-    # 既存：1万未満は100円単位で切り捨て
-    return (base // 100) * 100
+_DEFAULT_PRICE_RULES = price_rules.PriceRules()
 
 def is_checked_cell(v) -> bool:
     """
@@ -461,148 +711,480 @@ def is_checked_cell(v) -> bool:
     return False
 
 
-def main() -> int:
-    xlsm_path = Path(XLSM_PATH)
-    if not xlsm_path.exists():
-        raise FileNotFoundError(f"見つかりません: {xlsm_path}")
+# ===== シート1の1行 → マッチングキー =====
+# S1Key = (name_norm, name_exact, rainbow, secret_rank, ef_strict, f_strict, ef_loose, f_loose)
+S1Key = Tuple[str, str, bool, str, str, str, str, str]
 
-    wb = load_workbook(xlsm_path, keep_vba=True, data_only=False)
+# マッチした段
+PASS_STRICT_EF = "STRICT_EF"
+PASS_STRICT_F = "STRICT_F"
+PASS_LOOSE_EF = "LOOSE_EF"
+PASS_LOOSE_F = "LOOSE_F"
+PASS_RAINBOW = "RAINBOW"   # 虹の吸われ防止で非虹行へ付け替えた
 
-    if SHEET1 not in wb.sheetnames:
-        raise RuntimeError(f"シートがありません: {SHEET1}")
-    if SHEET2 not in wb.sheetnames:
-        raise RuntimeError(f"シートがありません: {SHEET2}")
+def s1_match_key(s1_name_raw: Any, s1_e_raw: Any, s1_f_raw: Any) -> Optional[S1Key]:
+    """シート1の1行（C/E/F列の値）を正規化してキーにする。名前も型番も無い行は None。"""
+    s1_name = "" if s1_name_raw is None else str(s1_name_raw).strip()
+    s1_name_exact = norm_name_raw_exact(s1_name)
+    s1_name_n = norm_name(s1_name)
+    s1_rainbow = has_rainbow_mark_raw(s1_name)
 
-    ws1 = wb[SHEET1]
-    ws2 = wb[SHEET2]
+    s1_model_f_disp = s1_model_raw_f_display(s1_f_raw)
+    ef_key_src = s1_model_ef_for_key(s1_e_raw, s1_f_raw)
 
-    s2_strict, s2_loose, s2_rows = build_s2_indexes(ws2)
+    ef_strict = model_strict(ef_key_src)
+    f_strict  = model_strict(s1_model_f_disp)
+    ef_loose  = model_loose(ef_key_src)
+    f_loose   = model_loose(s1_model_f_disp)
+
+    # 「秘」種別（STD超秘1 と STD秘1 を別物にする）
+    s1_secret_text = nfkc(cell_to_text(s1_e_raw)) + nfkc(cell_to_text(s1_f_raw)) + nfkc(s1_model_f_disp)
+    s1_secret_rank = secret_rank(s1_secret_text)
+
+    if not s1_name_n and not ef_strict and not f_strict:
+        return None
+    return (s1_name_n, s1_name_exact, s1_rainbow, s1_secret_rank, ef_strict, f_strict, ef_loose, f_loose)
+
+
+def pass_candidates(
+    key: S1Key,
+    pass_name: str,
+    s2_strict: Dict[Tuple[str, str], List[int]],
+    s2_loose: Dict[Tuple[str, str], List[int]],
+    s2_names: Dict[Tuple[str, bool, str], List[int]],
+) -> Optional[List[int]]:
+    """その段で参照するシート2の候補リスト（行順）"""
+    s1_name_n, _exact, _rb, rank, ef_strict, f_strict, ef_loose, f_loose = key
+    if pass_name == PASS_STRICT_EF:
+        return s2_strict.get((ef_strict, rank)) if ef_strict else None
+    if pass_name == PASS_STRICT_F:
+        return s2_strict.get((f_strict, rank)) if f_strict else None
+    if pass_name == PASS_LOOSE_EF:
+        return s2_loose.get((ef_loose, rank)) if ef_loose else None
+    if pass_name == PASS_LOOSE_F:
+        return s2_loose.get((f_loose, rank)) if f_loose else None
+    if pass_name == PASS_RAINBOW:
+        return s2_names.get((s1_name_n, False, rank))
+    raise ValueError(pass_name)
+
+
+def match_s1_key(
+    key: S1Key,
+    s2_strict: Dict[Tuple[str, str], List[int]],
+    s2_loose: Dict[Tuple[str, str], List[int]],
+    s2_rows: Dict[int, S2Row],
+    s2_names: Dict[Tuple[str, bool, str], List[int]],
+) -> Tuple[Optional[int], float, str]:
+    """
+    S1Key → (マッチしたシート2の行番号 or None, 名前スコア, マッチした段 or "")
+    STRICT EF → STRICT F → LOOSE EF → LOOSE F の順に探し、最後に虹の吸われ防止を掛ける。
+    """
+    s1_name_n, s1_name_exact, s1_rainbow, _rank, ef_strict, f_strict, ef_loose, f_loose = key
+
+    r2_final: Optional[int] = None
+    name_score = 0.0
+    matched_pass = ""
+
+    def pick(cand: List[int], required: float) -> Tuple[Optional[int], float]:
+        return pick_best_by_name_with_rainbow_preference(
+            cand, s1_name_n, s1_name_exact, s1_rainbow, s2_rows,
+            min_score=max(required, NAME_HARD_REJECT),
+        )
+
+    for pass_name, required in ((PASS_STRICT_EF, NAME_REQUIRED_FOR_STRICT),
+                                (PASS_STRICT_F, NAME_REQUIRED_FOR_STRICT),
+                                (PASS_LOOSE_EF, NAME_REQUIRED_FOR_LOOSE),
+                                (PASS_LOOSE_F, NAME_REQUIRED_FOR_LOOSE)):
+        cand = pass_candidates(key, pass_name, s2_strict, s2_loose, s2_names)
+        STATS.count_lookup(pass_name, len(cand) if cand else 0)
+        if cand:
+            rr, sc = pick(cand, required)
+            if rr is not None and sc >= required and sc >= NAME_HARD_REJECT:
+                r2_final = rr
+                name_score = sc
+                matched_pass = pass_name
+                break
+
+    # 通常版が虹に吸われるのを止める（既存方針）
+    if (r2_final is not None) and (not s1_rainbow):
+        r2_is_rb = s2_rows[r2_final].rainbow
+        if r2_is_rb is True:
+            # 同名・非虹・同じ秘種別の行（build_s2_indexes で索引済み）
+            STATS.rainbow_scans += 1
+            exact_name_non_rb = pass_candidates(key, PASS_RAINBOW, s2_strict, s2_loose, s2_names)
+            if exact_name_non_rb:
+                def model_rank(r2: int) -> int:
+                    ks, kl = s2_rows[r2].key_strict, s2_rows[r2].key_loose
+                    if ks and (ks == ef_strict or ks == f_strict):
+                        return 3
+                    if kl and (kl == ef_loose or kl == f_loose):
+                        return 2
+                    return 1
+
+                r2_final = max(exact_name_non_rb, key=model_rank)
+                name_score = 1.0
+                matched_pass = PASS_RAINBOW
+
+    return r2_final, name_score, matched_pass
+
+
+def match_s1_row(
+    s1_name_raw: Any,
+    s1_e_raw: Any,
+    s1_f_raw: Any,
+    s2_strict: Dict[Tuple[str, str], List[int]],
+    s2_loose: Dict[Tuple[str, str], List[int]],
+    s2_rows: Dict[int, S2Row],
+    s2_names: Dict[Tuple[str, bool, str], List[int]],
+) -> Tuple[Optional[int], float]:
+    """シート1の1行（C/E/F列の値）→ (マッチしたシート2の行番号 or None, 名前スコア)"""
+    key = s1_match_key(s1_name_raw, s1_e_raw, s1_f_raw)
+    if key is None:
+        return None, 0.0
+    r2, score, _pass = match_s1_key(key, s2_strict, s2_loose, s2_rows, s2_names)
+    return r2, score
 
-    matched = 0
-    updated = 0
-    skipped_no_s2_price = 0
 
-    for r1 in range(S1_HEADER_ROWS + 1, ws1.max_row + 1):
+# ===== マッチ結果キャッシュ（--match-cache）=====
+_CACHE_PASSES = (PASS_STRICT_EF, PASS_STRICT_F, PASS_LOOSE_EF, PASS_LOOSE_F, PASS_RAINBOW)
+# マッチのルールを意図して変えたら上げる（ソースのハッシュでも無効になるが、明示用）
+MATCH_CACHE_VERSION = 1
 
-        # ===== P列ロック（チェックボックス）=====
-        lock_flag = ws1.cell(r1, S1_COL_LOCK).value
-        if is_checked_cell(lock_flag):
+def matcher_fingerprint() -> str:
+    """
+    キャッシュを作ったときのマッチャー（このファイルのソース・しきい値・段の順）。
+    違えば match_cache.MatchCache がキャッシュを捨てる（正規化・しきい値・虹の扱いが変わったら古い結果は使えない）。
+    """
+    h = hashlib.blake2b(digest_size=16)
+    h.update(json.dumps([MATCH_CACHE_VERSION, NAME_HARD_REJECT, NAME_REQUIRED_FOR_STRICT,
+                         NAME_REQUIRED_FOR_LOOSE, list(_CACHE_PASSES)]).encode("utf-8"))
+    h.update(Path(__file__).read_bytes())
+    return h.hexdigest()
+
+def cache_key_text(key: S1Key) -> str:
+    return "\x1f".join("1" if v is True else "0" if v is False else v for v in key)
+
+def s2_deps_digest(key: S1Key, s2_index: tuple, memo: Dict[int, str]) -> str:
+    """
+    key のマッチ結果を決めるシート2候補リスト（全段ぶん）のダイジェスト。
+    候補の並びと、名前・虹・型番キーだけを見る（金額や行番号は含めない）。
+    """
+    s2_strict, s2_loose, s2_rows, s2_names = s2_index
+    parts: List[str] = []
+    for pass_name in _CACHE_PASSES:
+        cand = pass_candidates(key, pass_name, s2_strict, s2_loose, s2_names)
+        if not cand:
+            parts.append("")
             continue
+        mk = id(cand)  # 候補リストは索引の中の同じオブジェクトなので id で覚える
+        d = memo.get(mk)
+        if d is None:
+            h = hashlib.blake2b(digest_size=8)
+            for r2 in cand:
+                row = s2_rows[r2]
+                h.update("\x1f".join((row.name_exact, row.name_norm, "1" if row.rainbow else "0",
+                                       row.key_strict, row.key_loose)).encode("utf-8"))
+                h.update(b"\x1e")
+            d = memo[mk] = h.hexdigest()
+        parts.append(d)
+    return ".".join(parts)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description="シート2(CardRush)の金額でシート1(O列)の買取価格を更新")
+    ap.add_argument("--xlsm", default=XLSM_PATH, help="対象ブック（既定: スクリプトと同じフォルダの buylist.xlsm）")
+    ap.add_argument("--s2-snapshot", default=None, metavar="PATH",
+                    help="シート2の代わりに cardrush_to_excel.py --snapshot-db の最新スナップショットを使う")
+    ap.add_argument("--writer", choices=["patch", "openpyxl"], default=DEFAULT_WRITER,
+                    help="O列の書き戻し方式（patch=シート1XMLの該当セルのみ差し替え / openpyxl=ブック全体を保存）")
+    ap.add_argument("--workers", type=int, default=1,
+                    help="シート1のマッチングを並列化するプロセス数（結果は1プロセスと同一）")
+    ap.add_argument("--match-cache", default=None, metavar="PATH",
+                    help="マッチ結果の永続キャッシュ（SQLite）。候補が前回と同じ行は再マッチしない")
+    ap.add_argument("--dry-run", action="store_true", help="マッチングと価格計算だけ行い、ブックは保存しない")
+    ap.add_argument("--report", default=None, metavar="PATH",
+                    help="シート1全行のマッチ結果を JSON Lines で書き出す（段・スコア・旧/新価格・ロック）")
+    ap.add_argument("--price-rules", default=None, metavar="JSON",
+                    help="価格ルール（掛け率・固定値・丸め帯）のJSON。省略時は現行ルール（price_rules.DEFAULT_RULES）")
+    ap.add_argument("--stats", action="store_true",
+                    help="ステージ別の時間・メモリとマッチング内訳（類似度計算回数・段ごとの平均候補数など）を表示")
+    ap.add_argument("--stats-json", default=None, metavar="PATH", help="--stats の内容をJSONで保存（実行間の比較用）")
+    ap.add_argument("--trace-memory", action="store_true", help="tracemalloc でステージ別のPythonヒープピークも測る（遅くなる）")
+    return ap.parse_args(argv)
+
+
+def _resolve_cached(key: S1Key, entry, s2_index: tuple) -> Optional[Tuple[Optional[int], float, str]]:
+    """キャッシュの (段, 位置) を今回の索引の行番号に戻す。同一性が確認できなければ None（再マッチ）。"""
+    _deps, pass_name, pos, score, s2_name, s2_model = entry
+    if not pass_name:
+        return None, 0.0, ""
+    s2_strict, s2_loose, s2_rows, s2_names = s2_index
+    cand = pass_candidates(key, pass_name, s2_strict, s2_loose, s2_names)
+    if not cand or not (0 <= pos < len(cand)):
+        return None
+    r2 = cand[pos]
+    row = s2_rows[r2]
+    if (row.name_norm, row.key_strict) != (s2_name, s2_model):
+        return None
+    return r2, score, pass_name
 
-        s1_name_raw = ws1.cell(r1, S1_COL_NAME).value
-        s1_e_raw = ws1.cell(r1, S1_COL_E).value
-        s1_f_raw = ws1.cell(r1, S1_COL_F).value
 
-        s1_name = "" if s1_name_raw is None else str(s1_name_raw).strip()
-        s1_name_exact = norm_name_raw_exact(s1_name)
-        s1_name_n = norm_name(s1_name)
-        s1_rainbow = has_rainbow_mark_raw(s1_name)
+# ===== 並列マッチング（--workers）=====
+# S2Index = (s2_strict, s2_loose, s2_rows, s2_names)。ワーカーには初期化時に1回だけ渡す
+# （fork なら親のメモリをそのまま共有、spawn なら pickle した複製）。
+S1Job = Tuple[Any, Any, Any]  # (C列名, E列, F列)
+MatchResult = Tuple[Optional[int], float, str]  # (シート2行番号 or None, スコア, 段)
 
-        s1_model_f_disp = s1_model_raw_f_display(s1_f_raw)
-        ef_key_src = s1_model_ef_for_key(s1_e_raw, s1_f_raw)
+_worker_s2_index: Optional[tuple] = None
 
-        ef_strict = model_strict(ef_key_src)
-        f_strict  = model_strict(s1_model_f_disp)
-        ef_loose  = model_loose(ef_key_src)
-        f_loose   = model_loose(s1_model_f_disp)
+def _init_match_worker(s2_index: tuple):
+    global _worker_s2_index
+    _worker_s2_index = s2_index
 
-        # 「秘」種別（STD超秘1 と STD秘1 を別物にする）
-        s1_secret_text = nfkc(cell_to_text(s1_e_raw)) + nfkc(cell_to_text(s1_f_raw)) + nfkc(s1_model_f_disp)
-        s1_secret_rank = secret_rank(s1_secret_text)
+def _keys_chunk(jobs: List[S1Job], s2_index: Optional[tuple] = None) -> List[Optional[S1Key]]:
+    return [s1_match_key(name, e, f) for name, e, f in jobs]
 
-        if not s1_name_n and not ef_strict and not f_strict:
-            continue
+def _match_chunk(keys: List[S1Key], s2_index: Optional[tuple] = None) -> Tuple[List[MatchResult], Optional[dict]]:
+    """(結果, ワーカーで数えた MatchStats)。同一プロセス実行（s2_index 指定）ならカウンタは STATS に直接入る。"""
+    if s2_index is not None:
+        return [match_s1_key(k, *s2_index) for k in keys], None
+    STATS.reset()
+    results = [match_s1_key(k, *_worker_s2_index) for k in keys]
+    return results, STATS.as_dict()
 
-        r2_final: Optional[int] = None
-        name_score = 0.0
-
-        def secret_ok_for_row(r2: int) -> bool:
-            m2_disp, _n2_raw, _p2, _n2, _rb2, _exact = s2_rows[r2]
-            return s1_secret_rank == secret_rank(m2_disp)
-
-        def pick(cand: List[int]) -> Tuple[Optional[int], float]:
-            return pick_best_by_name_with_rainbow_preference(
-                cand, s1_name_n, s1_name_exact, s1_rainbow, s2_rows
-            )
-
-        # STRICT EF
-        if ef_strict and ef_strict in s2_strict:
-            cand = [r2 for r2 in s2_strict[ef_strict] if secret_ok_for_row(r2)]
-            if cand:
-                rr, sc = pick(cand)
-                if rr is not None and sc >= NAME_REQUIRED_FOR_STRICT and sc >= NAME_HARD_REJECT:
-                    r2_final = rr
-                    name_score = sc
-
-        # STRICT F
-        if r2_final is None and f_strict and f_strict in s2_strict:
-            cand = [r2 for r2 in s2_strict[f_strict] if secret_ok_for_row(r2)]
-            if cand:
-                rr, sc = pick(cand)
-                if rr is not None and sc >= NAME_REQUIRED_FOR_STRICT and sc >= NAME_HARD_REJECT:
-                    r2_final = rr
-                    name_score = sc
-
-        # LOOSE EF
-        if r2_final is None and ef_loose and ef_loose in s2_loose:
-            cand = [r2 for r2 in s2_loose[ef_loose] if secret_ok_for_row(r2)]
-            if cand:
-                rr, sc = pick(cand)
-                if rr is not None and sc >= NAME_REQUIRED_FOR_LOOSE and sc >= NAME_HARD_REJECT:
-                    r2_final = rr
-                    name_score = sc
-
-        # LOOSE F
-        if r2_final is None and f_loose and f_loose in s2_loose:
-            cand = [r2 for r2 in s2_loose[f_loose] if secret_ok_for_row(r2)]
-            if cand:
-                rr, sc = pick(cand)
-                if rr is not None and sc >= NAME_REQUIRED_FOR_LOOSE and sc >= NAME_HARD_REJECT:
-                    r2_final = rr
-                    name_score = sc
-
-        # 通常版が虹に吸われるのを止める（既存方針）
-        if (r2_final is not None) and (not s1_rainbow):
-            _m2_disp, _n2_raw, _p2, _n2_norm, r2_is_rb, _exact = s2_rows[r2_final]
-            if r2_is_rb is True:
-                exact_name_non_rb = [
-                    r2 for r2, (_md, _nr, _pr, n_norm, rb, _ex) in s2_rows.items()
-                    if (rb is False) and (n_norm == s1_name_n) and secret_ok_for_row(r2)
-                ]
-                if exact_name_non_rb:
-                    def model_rank(r2: int) -> int:
-                        md = s2_rows[r2][0]
-                        ks = model_strict(md)
-                        kl = model_loose(md)
-                        if ks and (ks == ef_strict or ks == f_strict):
-                            return 3
-                        if kl and (kl == ef_loose or kl == f_loose):
-                            return 2
-                        return 1
-
-                    r2_final = max(exact_name_non_rb, key=model_rank)
-                    name_score = 1.0
-
-        # ===== マッチしたら O列更新 =====
-        if r2_final is not None:
-            matched += 1
-            _m2_disp, _n2_raw, s2_price, _n2, _rb2, _exact = s2_rows[r2_final]
-
-            if s2_price is None:
-                skipped_no_s2_price += 1
+def match_s1_rows(jobs: List[S1Job], s2_index: tuple, workers: int = 1, cache=None,
+                  chunk_size: int = 250) -> List[MatchResult]:
+    """
+    シート1の各行をキー化 → マッチング。結果は jobs と同じ順序。
+    workers > 1 ならプロセスプールでチャンクごとに並列化（順序どおりに結合するので1プロセスと同一の結果）。
+    cache（match_cache.MatchCache）があれば、参照する候補リストが前回と同じ行はキャッシュの結果を使う。
+    """
+    ex = None
+    if workers > 1 and len(jobs) > chunk_size:
+        methods = multiprocessing.get_all_start_methods()
+        ctx = multiprocessing.get_context("fork" if "fork" in methods else None)
+        ex = ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                                 initializer=_init_match_worker, initargs=(s2_index,))
+
+    def pmap(chunk_fn, items: list) -> list:
+        """チャンクごとの戻り値のリスト（順序どおり）"""
+        if ex is None or len(items) <= chunk_size:
+            return [chunk_fn(items, s2_index)]
+        return list(ex.map(chunk_fn, [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]))
+
+    try:
+        keys = [k for part in pmap(_keys_chunk, jobs) for k in part]
+        results: List[MatchResult] = [(None, 0.0, "")] * len(jobs)
+        todo: List[int] = []
+        deps: Dict[int, str] = {}
+        memo: Dict[int, str] = {}
+        for i, key in enumerate(keys):
+            if key is None:
                 continue
+            if cache is not None:
+                deps[i] = s2_deps_digest(key, s2_index, memo)
+                entry = cache.get(cache_key_text(key), deps[i])
+                hit = _resolve_cached(key, entry, s2_index) if entry is not None else None
+                cache.count(hit is not None)
+                if hit is not None:
+                    results[i] = hit
+                    continue
+            todo.append(i)
+
+        matched_parts: List[MatchResult] = []
+        for part, worker_stats in pmap(_match_chunk, [keys[i] for i in todo]):
+            matched_parts.extend(part)
+            if worker_stats is not None:
+                STATS.merge(worker_stats)
+
+        for i, res in zip(todo, matched_parts):
+            results[i] = res
+            if cache is not None:
+                r2, score, pass_name = res
+                if r2 is None:
+                    cache.put(cache_key_text(keys[i]), (deps[i], "", -1, 0.0, "", ""))
+                else:
+                    s2_strict, s2_loose, s2_rows, s2_names = s2_index
+                    pos = pass_candidates(keys[i], pass_name, s2_strict, s2_loose, s2_names).index(r2)
+                    row = s2_rows[r2]
+                    cache.put(cache_key_text(keys[i]), (deps[i], pass_name, pos, score, row.name_norm, row.key_strict))
+        return results
+    finally:
+        if ex is not None:
+            ex.shutdown()
+
+
+# ===== O列書き戻し =====
+def write_s1_prices_patch(xlsm_path: Path, changes: List[Tuple[int, int]]):
+    """
+    changes = [(シート1の行番号, 新価格)] の O列セルだけをシート1のXML上で差し替える。
+    他のパーツ（シート2・VBA・スタイル等）は圧縮バイトのままコピー。
+    """
+    with zipfile.ZipFile(xlsm_path) as zf:
+        part = xlsm_zip.find_sheet_part(zf, SHEET1)
+    if part is None:
+        raise RuntimeError(f"シートのXMLが見つかりません: {SHEET1}")
+    updates = {r1: {S1_COL_PRICE: new_price} for r1, new_price in changes}
 
-            new_price = calc_new_price_from_s2(float(s2_price))
+    def writer(zin: zipfile.ZipFile, out):
+        out.write(xlsm_zip.patch_cells(zin.read(part), updates))
+
+    xlsm_zip.rewrite_members(str(xlsm_path), {part: writer})
+
+
+def write_s1_prices_openpyxl(xlsm_path: Path, changes: List[Tuple[int, int]]):
+    """changes = [(シート1の行番号, 新価格)] だけをO列へ書いて、ブック全体を openpyxl で保存"""
+    wb = load_workbook(xlsm_path, keep_vba=True, data_only=False)
+    try:
+        ws1 = wb[SHEET1]
+        for r1, new_price in changes:
             ws1.cell(r1, S1_COL_PRICE).value = new_price
-            updated += 1
+        wb.save(xlsm_path)
+    finally:
+        wb.close()
 
-    wb.save(xlsm_path)
-    wb.close()
 
-    print("✅ 完了: シート2の金額(95%)を丸めて、マッチした行のみシート1(O列)へ上書きしました。")
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    xlsm_path = Path(args.xlsm)
+    if not xlsm_path.exists():
+        raise FileNotFoundError(f"見つかりません: {xlsm_path}")
+
+    t_start = time.perf_counter()
+    timer = StageTimer(trace_memory=args.trace_memory)
+    STATS.reset()
+
+    # 読むのは read_only（ストリーム）で両シートとも1パス
+    wb = load_workbook(xlsm_path, read_only=True, data_only=False)
+    try:
+        if SHEET1 not in wb.sheetnames:
+            raise RuntimeError(f"シートがありません: {SHEET1}")
+        if not args.s2_snapshot and SHEET2 not in wb.sheetnames:
+            raise RuntimeError(f"シートがありません: {SHEET2}")
+
+        with timer.stage("read_s1") as st:
+            s1 = read_s1_columns(wb[SHEET1])
+            st["rows"] = len(s1.rows)
+
+        with timer.stage("s2_index") as st:
+            if args.s2_snapshot:
+                s2_index = build_s2_indexes_from_rows(iter_s2_rows_from_snapshot(args.s2_snapshot))
+            else:
+                s2_index = build_s2_indexes(wb[SHEET2])
+            st["rows"] = len(s2_index[2])
+    finally:
+        wb.close()
+
+    matched = 0
+    updated = 0
+    skipped_no_s2_price = 0
+    changes: List[Tuple[int, int]] = []
+    s2_rows = s2_index[2]
+
+    # ===== P列ロック（チェックボックス）の行は更新対象外（--report 時はマッチだけ見る）=====
+    locked = [is_checked_cell(v) for v in s1.lock]
+    targets = [i for i in range(len(s1.rows)) if args.report or not locked[i]]
+    cache = None
+    if args.match_cache:
+        import match_cache
+        cache = match_cache.MatchCache(args.match_cache, fingerprint=matcher_fingerprint())
+    with timer.stage("match") as st:
+        results = match_s1_rows([(s1.name[i], s1.e[i], s1.f[i]) for i in targets], s2_index,
+                                workers=args.workers, cache=cache)
+        if cache is not None:
+            cache.save()
+        st["rows"] = len(targets)
+
+    # ===== 新価格はマッチした行の分をまとめて計算 =====
+    with timer.stage("price") as st:
+        rules = price_rules.PriceRules.load(args.price_rules)
+        priced = [k for k, (r2, _sc, _p) in enumerate(results) if r2 is not None and s2_rows[r2].price is not None]
+        new_prices = rules.evaluate([s2_rows[results[k][0]].price for k in priced])
+        new_price_of = dict(zip(priced, (int(v) for v in new_prices)))
+        st["rows"] = len(priced)
+
+    report = open(args.report, "w", encoding="utf-8", newline="\n") if args.report else None
+    try:
+        with timer.stage("diff") as st:
+            st["rows"] = len(targets)
+            for k, (i, (r2_final, name_score, pass_name)) in enumerate(zip(targets, results)):
+                r1 = s1.rows[i]
+                new_price = new_price_of.get(k)
+                s2 = s2_rows[r2_final] if r2_final is not None else None
+
+                # ===== マッチしたら O列更新 =====
+                if s2 is not None and not locked[i]:
+                    matched += 1
+                    if new_price is None:
+                        skipped_no_s2_price += 1
+                    else:
+                        updated += 1
+                        if s1.price[i] != new_price:
+                            changes.append((r1, new_price))
+
+                if report is not None:
+                    report.write(json.dumps({
+                        "row": r1,
+                        "name": s1.name[i],
+                        "locked": locked[i],
+                        "pass": pass_name or None,
+                        "score": name_score if s2 is not None else None,
+                        "s2_row": r2_final,
+                        "s2_name": s2.name_raw if s2 is not None else None,
+                        "s2_model": s2.model_disp if s2 is not None else None,
+                        "s2_price": s2.price if s2 is not None else None,
+                        "old_price": s1.price[i],
+                        "new_price": new_price,
+                        "changed": (not locked[i]) and new_price is not None and s1.price[i] != new_price,
+                    }, ensure_ascii=False, default=str) + "\n")
+    finally:
+        if report is not None:
+            report.close()
+
+    # 価格が1件も変わらなければブックには触らない
+    if args.dry_run:
+        print(f"[dry-run] ブックは保存しません（変更予定 {len(changes)} 件）")
+    elif changes:
+        with timer.stage("write") as st:
+            st["rows"] = len(changes)
+            if args.writer == "patch":
+                write_s1_prices_patch(xlsm_path, changes)
+            else:
+                write_s1_prices_openpyxl(xlsm_path, changes)
+
+    if not args.dry_run:
+        print("✅ 完了: シート2の金額(95%)を丸めて、マッチした行のみシート1(O列)へ上書きしました。")
     print(f"   matched: {matched}")
     print(f"   updated: {updated}")
+    print(f"   changed: {len(changes)}")
+    if cache is not None:
+        print(f"   match cache: {cache.report()}")
     print(f"   skipped (S2 price empty): {skipped_no_s2_price}")
+    if args.report:
+        print(f"   report: {args.report}")
+
+    if args.stats or args.stats_json:
+        total = time.perf_counter() - t_start
+        ms = STATS.as_dict()
+        if args.stats:
+            print(f"[stats] total {total:.3f}s")
+            for line in timer.summary_lines():
+                print(line)
+            print(f"   SequenceMatcher calls: {ms['ratio_calls']} / rainbow fallback scans: {ms['rainbow_scans']}")
+            for pass_name, n in ms["lookups"].items():
+                print(f"   {pass_name:<10} lookups {n:>6}  avg candidates {ms['avg_candidates'].get(pass_name, 0):.2f}")
+        if args.stats_json:
+            Path(args.stats_json).write_text(json.dumps({
+                "xlsm": str(xlsm_path),
+                "at": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "workers": args.workers,
+                "total_seconds": round(total, 4),
+                "stages": timer.stages,
+                "match": ms,
+                "counts": {"matched": matched, "updated": updated, "changed": len(changes),
+                           "skipped_no_s2_price": skipped_no_s2_price},
+                "match_cache": ({"hits": cache.hits, "misses": cache.misses} if cache is not None else None),
+            }, ensure_ascii=False, indent=2), encoding="utf-8")
     return 0
 
 